@@ -0,0 +1,218 @@
+"""
+
+Contains the run parameters and the functions that read them from a config file, the command line or the menu, so a
+simulation can be set up without a display.
+
+A config file is a JSON or YAML dictionary using the keys of defaults; any key left out takes its default, i.e.
+
+    {"deltaT": 3600, "startDate": "04/12/2023", "endDate": "04/12/2024", "algorithm": "leapfrog"}
+
+"""
+
+import json
+import data
+
+#The parameters of a run, and the values used when they aren't given.
+defaults = {
+    'deltaT': 100,
+    'startDate': '04/12/2023',
+    'endDate': '05/12/2023',
+    'algorithm': 'leapfrog',
+    'solver': 'direct',
+    'theta': 0.5,
+    'encounterFactor': 3.0,
+    'outputEvery': 0,
+    'tolerance': 1e-10,
+    'minStep': 1,
+    'maxStep': 86400,
+    'customBodies': [],
+    'directory': 'ephemeride_data',
+    'text': True,
+    'trajectoryCheck': True,
+    'chunkSize': None,
+    'plot': True,
+    'plotPoints': 2000,
+    'plotMethod': 'lttb',
+    'plotFile': None,
+    'animationFile': None,
+    'checkpointEvery': 0,
+    'resume': False,
+    'profile': False,
+    'profileTrace': False,
+}
+
+#The values a custom body takes when they aren't given, the same as the menu's.
+bodyDefaults = {
+    'name': 'Satellite',
+    'mass': 1000.0,
+    'radius': 10.0,
+    'position': [0.0, 0.0, 0.0],
+    'velocity': [0.0, 0.0, 0.0],
+    'colour': '#ffffff',
+    'passive': False,
+}
+
+def custom_body(body):
+    """
+
+    Converts a custom body from a config file into the dictionary format that data.jpl_scrape outputs.
+
+        Parameters:
+            body (dict): Any of the keys of bodyDefaults, in any case, i.e. 'mass' or 'Mass'.
+
+        Returns:
+            body (dict): The body with the keys 'Name', 'Mass', 'Radius', 'Position', 'Velocity', 'Colour' and 'Passive'.
+
+    """
+    values = dict(bodyDefaults)
+
+    for key, value in body.items():
+        if key.lower() not in bodyDefaults:
+            raise ValueError('Custom body keys must be some of: ' + ', '.join(bodyDefaults))
+
+        values[key.lower()] = value
+
+    if len(values['position']) != 3 or len(values['velocity']) != 3:
+        raise ValueError('Custom body position and velocity must be 3-vectors')
+
+    return({
+        'Name': str(values['name']),
+        'Mass': float(values['mass']),
+        'Radius': float(values['radius']),
+        'Position': [float(component) for component in values['position']],
+        'Velocity': [float(component) for component in values['velocity']],
+        'Colour': str(values['colour']),
+        'Passive': values['passive'] in [True, 'y', 'yes']
+    })
+
+def make_config(values = None, **overrides):
+    """
+
+    Fills in the defaults for any missing run parameters.
+
+        Parameters:
+            values (dict): The run parameters given, i.e. read from a config file.
+
+            overrides (dict): Further run parameters, which take precedence over values.
+
+        Returns:
+            config (dict): Every run parameter in defaults.
+
+    """
+    config = dict(defaults)
+
+    for key, value in list((values or {}).items()) + list(overrides.items()):
+        if key not in defaults:
+            raise ValueError('Unknown run parameter ' + repr(key) + ', must be one of: ' + ', '.join(defaults))
+
+        config[key] = value
+
+    config['customBodies'] = [custom_body(body) for body in config['customBodies']]
+
+    return(config)
+
+def read_file(fileName):
+    """
+
+    Reads a dictionary from a JSON or YAML file, chosen by its extension.
+
+        Parameters:
+            fileName (str): The path of the file.
+
+        Returns:
+            values (dict): The contents of the file.
+
+    """
+    f = open(fileName, 'r')
+
+    if fileName.lower().endswith(('.yaml', '.yml')):
+        #PyYAML is only needed for YAML files.
+        try:
+            import yaml
+        except ImportError as error:
+            f.close()
+            raise ImportError('YAML config files need PyYAML installed, or use a JSON file instead') from error
+
+        values = yaml.safe_load(f)
+
+    else:
+        values = json.load(f)
+
+    f.close()
+
+    return(values)
+
+def load_config(fileName, **overrides):
+    """
+
+    Reads the run parameters from a JSON or YAML config file.
+
+        Parameters:
+            fileName (str): The path of the config file.
+
+            overrides (dict): Run parameters that take precedence over the file's.
+
+        Returns:
+            config (dict): Every run parameter in defaults.
+
+    """
+    return(make_config(read_file(fileName), **overrides))
+
+def parse_value(text):
+    """
+
+    Converts a value typed on the command line, reading it as JSON if possible, i.e. '3600' or 'true', and as text
+    otherwise, i.e. 'leapfrog'.
+
+    """
+    try:
+        return(json.loads(text))
+    except ValueError:
+        return(text)
+
+def date_string(date):
+    """
+
+    Converts a date written dd/mm/yyyy, as in the menu, into an astropy-compatible date string.
+
+        Parameters:
+            date (str): The date, dd/mm/yyyy.
+
+        Returns:
+            dateString (str): The date in the format of data.date_convert.
+
+    """
+    parts = str(date).split('/')
+
+    if len(parts) != 3:
+        raise ValueError('Dates must be written dd/mm/yyyy, not ' + repr(date))
+
+    return(data.date_convert(day = parts[0].strip(), month = parts[1].strip(), year = parts[2].strip()))
+
+def from_menu(menu):
+    """
+
+    Reads the run parameters from a closed menu.
+
+        Parameters:
+            menu (Menu.MainWindow): The menu, after Continue has been pressed.
+
+        Returns:
+            config (dict): Every run parameter in defaults.
+
+    """
+    outputs = menu.outputs
+
+    return(make_config(
+        deltaT = int(outputs[0]),
+        startDate = '/'.join(outputs[1:4]),
+        endDate = '/'.join(outputs[4:7]),
+        algorithm = outputs[7],
+        solver = outputs[8],
+        theta = float(outputs[9]),
+        outputEvery = float(outputs[10] or 0),
+        tolerance = float(outputs[11]),
+        minStep = float(outputs[12]),
+        maxStep = float(outputs[13]),
+        customBodies = menu.customBodies,
+    ))
@@ -5,12 +5,20 @@ Contains all the functions that perform file handling actions.
 """
 
 import os
+import json
+import atexit
+import numpy as np
 import Tests
 
-def setup_files(deltaT, startDate, endDate, algorithm, system):
+#The files every run writes to its output folder, besides one text file per body.
+runFiles = ['!summary_file.txt', 'energy.txt', 'total_LM.txt', 'total_AM.txt', 'trajectory.npy', 'trajectory.json',
+    'checkpoint.npz', 'profile_trace.jsonl']
+
+def setup_files(deltaT, startDate, endDate, algorithm, system, directory = 'ephemeride_data'):
     """
 
-    Clears all current files in ephemeride_data and creates new ones for the new run.
+    Clears the files an earlier run wrote to the output folder, ephemeride_data by default, and creates new ones for the
+    new run. Only the files a run writes are deleted, as the folder is a run parameter and could hold anything else.
 
         Parameters:
             deltaT (int/float): The time interval across which the particle moves.
@@ -23,15 +31,24 @@ def setup_files(deltaT, startDate, endDate, algorithm, system):
 
             system(list-like): Contains all Particle instances defined for the system.
 
+            directory (str): The folder the files are written to.
+
     """
 
-    #Finds ephemeride_data within the current working directory.
-    directory = os.getcwd() + '/ephemeride_data'
+    #Creates the folder if this is its first run.
+    os.makedirs(directory, exist_ok = True)
+
+    #The bodies of this run, and of the last run if it kept a trajectory store, each have their own file.
+    names = [body.name for body in system]
+    try:
+        f = open(os.path.join(directory, 'trajectory.json'), 'r')
+        names += json.load(f).get('names', [])
+        f.close()
+    except (OSError, ValueError):
+        pass
+
+    for file in set(name + '.txt' for name in names) | set(runFiles):
 
-    #Creates a list of all files in ephemeride_data
-    files = os.listdir(directory)
-    for file in files:
-        
         #Creates a file path for each file
         file_path = os.path.join(directory, file)
 
@@ -41,7 +58,7 @@ def setup_files(deltaT, startDate, endDate, algorithm, system):
 
 
     #Sets the file name
-    fileName = 'ephemeride_data/!summary_file.txt'
+    fileName = directory + '/!summary_file.txt'
 
     #Creates and opens the file
     f = open(fileName, 'x')
@@ -57,8 +74,8 @@ def setup_files(deltaT, startDate, endDate, algorithm, system):
         #Creates a string containing each position element.
         position = str(body.position[0]) + ' ' + str(body.position[1]) + ' ' + str(body.position[2])
 
-        #Creates the file name in the form ephemeride_data/name.txt
-        fileName = 'ephemeride_data/' + body.name + '.txt'
+        #Creates the file name in the form directory/name.txt
+        fileName = directory + '/' + body.name + '.txt'
 
         f = open(fileName, 'x')
         f.write(position + '\n')
@@ -67,51 +84,53 @@ def setup_files(deltaT, startDate, endDate, algorithm, system):
     #Initialises conservation quantity files
 
     #Energy file
-    fileName = 'ephemeride_data/energy.txt'
+    fileName = directory + '/energy.txt'
     f = open(fileName, 'x')
     f.write(str(Tests.total_KE(system) + Tests.total_PE(system)) + '\n')
     f.close()
 
     #Linear momentum file
 
-    LM = str(Tests.total_LM(system)[0]) + ' ' + str(Tests.total_LM(system)[1]) + ' ' + str(Tests.total_LM(system)[2])
+    LM = ' '.join(str(component) for component in Tests.total_LM(system))
 
-    fileName = 'ephemeride_data/total_LM.txt'
+    fileName = directory + '/total_LM.txt'
     f = open(fileName, 'x')
     f.write(LM + '\n')
     f.close()
 
     #Angular momentum file
 
-    AM = str(Tests.total_AM(system)[0]) + ' ' + str(Tests.total_AM(system)[1]) + ' ' + str(Tests.total_AM(system)[2])
+    AM = ' '.join(str(component) for component in Tests.total_AM(system))
 
-    fileName = 'ephemeride_data/total_AM.txt'
+    fileName = directory + '/total_AM.txt'
     f = open(fileName, 'x')
     f.write(AM + '\n')
     f.close()
 
-def ephemeride_file(body):
+def ephemeride_file(body, directory = 'ephemeride_data'):
     """
 
     Creates a text file for each body storing the position of each body during each time interval.
 
-    All files are stored in the folder ephemeride_data
+    All files are stored in the folder ephemeride_data, unless another is given.
 
         Parameters:
             body (object): The solar system body whose data is currently being stored.
 
+            directory (str): The folder the files are written to.
+
     """
     #Creates a string containing each position element.
     position = str(body.position[0]) + ' ' + str(body.position[1]) + ' ' + str(body.position[2])
 
-    fileName = 'ephemeride_data/' + body.name + '.txt'
+    fileName = directory + '/' + body.name + '.txt'
 
     #Writes to the file
     f = open(fileName, 'a')
     f.write(position + '\n')
     f.close()
 
-def energy_file(system):
+def energy_file(system, directory = 'ephemeride_data'):
     """
 
     Updates the energy file.
@@ -119,14 +138,16 @@ def energy_file(system):
         Parameters:
             system(list-like): Contains all Particle instances defined for the system.
 
+            directory (str): The folder the files are written to.
+
     """
     #Writes to the file
-    fileName = 'ephemeride_data/Energy.txt'
+    fileName = directory + '/energy.txt'
     f = open(fileName, 'a')
     f.write(str(Tests.total_KE(system) + Tests.total_PE(system)) + '\n')
     f.close()
 
-def LM_file(system):
+def LM_file(system, directory = 'ephemeride_data'):
     """
 
     Updates the linear momentum file.
@@ -134,17 +155,19 @@ def LM_file(system):
         Parameters:
             system(list-like): Contains all Particle instances defined for the system.
 
+            directory (str): The folder the files are written to.
+
     """
     #Creates a string containing each linear momentum element.
-    LM = str(Tests.total_LM(system)[0]) + ' ' + str(Tests.total_LM(system)[1]) + ' ' + str(Tests.total_LM(system)[2])
+    LM = ' '.join(str(component) for component in Tests.total_LM(system))
 
     #Writes to the file
-    fileName = 'ephemeride_data/Total_LM.txt'
+    fileName = directory + '/total_LM.txt'
     f = open(fileName, 'a')
     f.write(LM + '\n')
     f.close()
 
-def AM_file(system):
+def AM_file(system, directory = 'ephemeride_data'):
     """
 
     Updates the angular momentum file.
@@ -152,24 +175,559 @@ def AM_file(system):
         Parameters:
             system(list-like): Contains all Particle instances defined for the system.
 
+            directory (str): The folder the files are written to.
+
     """
     #Creates a string containing each angular momentum element.
-    AM = str(Tests.total_AM(system)[0]) + ' ' + str(Tests.total_AM(system)[1]) + ' ' + str(Tests.total_AM(system)[2])
+    AM = ' '.join(str(component) for component in Tests.total_AM(system))
 
     #Writes to the file.
-    fileName = 'ephemeride_data/Total_AM.txt'
+    fileName = directory + '/total_AM.txt'
     f = open(fileName, 'a')
     f.write(AM + '\n')
     f.close()
 
-def scrape_position_data(system):
+def format_rows(rows):
+    """
+
+    Formats the rows of an array as lines of space-separated numbers, in the same form as the other file functions.
+
+        Parameters:
+            rows (array-like): A 1-D array of numbers, one per line, or a 2-D array with one row per line.
+
+        Returns:
+            text (str): The formatted lines.
+
+    """
+    rows = np.asarray(rows)
+
+    if rows.ndim == 1:
+        return(''.join(repr(number) + '\n' for number in rows.tolist()))
+
+    return(''.join(' '.join(map(repr, row)) + '\n' for row in rows.tolist()))
+
+
+def npy_header(shape, length = 256):
+    """
+
+    Creates a fixed-length .npy header for a float64 array, so the header can be rewritten in place as the array grows.
+
+        Parameters:
+            shape (tuple): The shape of the array.
+
+            length (int): The total length of the header in bytes, a multiple of 64.
+
+        Returns:
+            header (bytes): The .npy magic string, version and header dictionary, padded with spaces.
+
+    """
+    dictionary = "{'descr': '<f8', 'fortran_order': False, 'shape': " + repr(tuple(shape)) + ", }"
+
+    #The magic string, version 1.0, and the length of the rest of the header.
+    prefix = b'\x93NUMPY\x01\x00' + (length - 10).to_bytes(2, 'little')
+
+    return(prefix + (dictionary.ljust(length - 11) + '\n').encode('latin1'))
+
+
+def output_stride(deltaT, interval):
+    """
+
+    Converts an output interval in simulated seconds into the number of steps between outputs.
+
+        Parameters:
+            deltaT (int/float): The time interval across which the particle moves.
+
+            interval (int/float): The simulated time between outputs, in seconds. 0 writes every step.
+
+        Returns:
+            stride (int): The number of steps between outputs, at least 1.
+
+    """
+    return(max(1, int(round(interval / deltaT))))
+
+def stored_steps(records, stride):
+    """
+
+    Returns how many states a TrajectoryWriter stores over a run: the initial state, every stride-th recorded step, and
+    the final step if it falls between outputs.
+
+        Parameters:
+            records (int): The number of steps, or adaptive outputs, recorded.
+
+            stride (int): The number of steps between outputs.
+
+        Returns:
+            stored (int): The number of states in the binary trajectory store.
+
+    """
+    return(1 + records // stride + (1 if records % stride else 0))
+
+def chunk_size(bodyNumber, budget = 64 * 2**20, largest = 1000):
+    """
+
+    Picks how many steps a TrajectoryWriter buffers, so its position buffer fits in a memory budget however many bodies
+    there are.
+
+        Parameters:
+            bodyNumber (int): The number of bodies.
+
+            budget (int): The most bytes the position buffer may take, 24 per body per step.
+
+            largest (int): The most steps buffered, however few bodies there are.
+
+        Returns:
+            chunkSize (int): The number of steps buffered, at least 1.
+
+    """
+    return(max(1, min(largest, budget // (24 * bodyNumber))))
+
+
+class TrajectoryWriter:
+    """
+
+    Writes the ephemeride and conservation files during a run, keeping every file open and buffering the steps in
+    arrays so they are written in chunks.
+
+    The positions can also be written to a binary trajectory.npy file of shape (steps, N, 3), with its deltaT, dates,
+    algorithm and body names in trajectory.json, which can be read back with load_trajectory.
+
+    Only every stride-th step is kept, so the output volume doesn't depend on deltaT. The last recorded state is always
+    kept when the writer is closed, even if it falls between outputs.
+
+    It can be used as a context manager, which guarantees the buffer is flushed if the run ends with an exception.
+
+    A writer can carry on from the offsets saved in a checkpoint, cutting off anything written after the checkpoint and
+    appending from there.
+
+        Attributes:
+            directory (str): The folder the files are written to.
+
+            names (list-like): The name of each body, which is also its file name.
+
+            chunkSize (int): The number of steps held in the buffers before they are written.
+
+            buffered (int): The number of steps currently held in the buffers.
+
+            stride (int): The number of steps between outputs.
+
+            steps (int): The number of steps recorded so far, including those not written.
+
+            text (bool): Whether the text ephemeride and conservation files are written.
+
+            binary (bool): Whether the binary trajectory store is written.
+
+            stored (int): The number of steps in the binary trajectory store.
+
+        Methods:
+            record(system): Counts a step and adds the current state of the system to the buffers on output steps.
+
+            due(): Returns whether the next recorded step is an output step.
+
+            store(system): Adds the current state of the system to the buffers.
+
+            flush(): Writes all buffered steps to the files.
+
+            close(): Flushes the buffers and closes every file.
+
+            offsets(): Flushes the buffers and returns the size of every file, for a checkpoint.
+
+    """
+
+    def __init__(self, system, directory = 'ephemeride_data', chunkSize = None, text = True, binary = False, header = None,
+        stride = 1, resume = None):
+        """
+
+        Initialises a new TrajectoryWriter instance, opening every text file in 'append' mode.
+
+        The binary store is created from scratch and starts with the current positions, as setup_files does for the
+        text files.
+
+            Parameters:
+                system (System): Contains all Particle instances defined for the system.
+
+                directory (str): The folder the files are written to.
+
+                chunkSize (int): The number of steps held in the buffers before they are written, by default as many as
+                fit in 64 MB, see chunk_size.
+
+                text (bool): Whether the text ephemeride and conservation files are written.
+
+                binary (bool): Whether the binary trajectory store is written.
+
+                header (dict): The run parameters stored in trajectory.json, i.e. deltaT, dates and algorithm.
+
+                stride (int): The number of steps between outputs, see output_stride.
+
+                resume (dict): The offsets saved in a checkpoint, see offsets(), to carry on an earlier run's files.
+
+        """
+        self.directory = directory
+        self.system = system
+        self.names = [body.name for body in system]
+        self.chunkSize = chunkSize or chunk_size(len(self.names))
+        self.buffered = 0
+        self.stride = stride
+        self.steps = 0
+        self.text = text
+        self.binary = binary
+        self.stored = 0
+
+        #Cuts every file back to its size at the checkpoint, so the steps after it aren't written twice.
+        if resume is not None:
+            self.steps = int(resume['steps'])
+            self.stored = int(resume['stored'])
+
+            if text:
+                for name, offset in zip(self.names + ['energy', 'total_LM', 'total_AM'], resume['textOffsets']):
+                    os.truncate(os.path.join(directory, name + '.txt'), int(offset))
+
+        #Opens one file per body, then the conservation files.
+        self.textFiles = []
+        if text:
+            self.bodyFiles = [open(os.path.join(directory, name + '.txt'), 'a') for name in self.names]
+            self.energyFile = open(os.path.join(directory, 'energy.txt'), 'a')
+            self.LMFile = open(os.path.join(directory, 'total_LM.txt'), 'a')
+            self.AMFile = open(os.path.join(directory, 'total_AM.txt'), 'a')
+            self.textFiles = self.bodyFiles + [self.energyFile, self.LMFile, self.AMFile]
+
+        #Reopens the binary store where the checkpoint left it.
+        if binary and resume is not None:
+            self.binaryFile = open(os.path.join(directory, 'trajectory.npy'), 'r+b')
+            self.binaryFile.truncate(int(resume['binaryOffset']))
+            self.binaryFile.seek(0)
+            self.binaryFile.write(npy_header((self.stored, len(self.names), 3)))
+            self.binaryFile.seek(0, os.SEEK_END)
+
+        #Writes the header and opens the binary store.
+        elif binary:
+            header = dict(header or {})
+            header['stride'] = stride
+            header['names'] = self.names
+            header['colours'] = [body.colour for body in system]
+
+            f = open(os.path.join(directory, 'trajectory.json'), 'w')
+            json.dump(header, f, indent = 4)
+            f.close()
+
+            self.binaryFile = open(os.path.join(directory, 'trajectory.npy'), 'wb')
+            self.binaryFile.write(npy_header((0, len(self.names), 3)))
+
+        #Preallocates the buffers.
+        self.positions = np.empty((self.chunkSize, len(self.names), 3))
+        self.energies = np.empty(self.chunkSize)
+        self.linearMomenta = np.empty((self.chunkSize, 3))
+        self.angularMomenta = np.empty((self.chunkSize, 3))
+
+        self.closed = False
+
+        #Makes sure the buffers are written even if the interpreter exits without closing the writer.
+        atexit.register(self.close)
+
+        if binary and resume is None:
+            self.positions[0] = [body.position for body in system]
+            self.buffered = 1
+            self.flush(text = False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def record(self, system, diagnostics = None):
+        """
+
+        Counts a step, and adds the current positions, energy, linear momentum and angular momentum of the system to the
+        buffers if it is an output step.
+
+            Parameters:
+                system (System): Contains all Particle instances defined for the system.
+
+                diagnostics (tuple): The energy, linear momentum and angular momentum if already calculated.
+
+        """
+        self.steps += 1
+        self.system = system
+
+        if self.steps % self.stride == 0:
+            self.store(system, diagnostics)
+
+    def due(self):
+        """
+
+        Returns whether the next recorded step is an output step, so anything only written on output steps need not be
+        calculated on the others.
+
+            Returns:
+                due (bool): Whether the next step is stored.
+
+        """
+        return((self.steps + 1) % self.stride == 0)
+
+    def store(self, system, diagnostics = None):
+        """
+
+        Adds the current positions, energy, linear momentum and angular momentum of the system to the buffers.
+
+            Parameters:
+                system (System): Contains all Particle instances defined for the system.
+
+                diagnostics (tuple): The energy, linear momentum and angular momentum if already calculated.
+
+        """
+        row = self.buffered
+
+        if diagnostics is None:
+            kineticEnergy, potentialEnergy, linearMomentum, angularMomentum = Tests.diagnostics(system)
+            diagnostics = (kineticEnergy + potentialEnergy, linearMomentum, angularMomentum)
+
+        self.positions[row] = [body.position for body in system]
+        self.energies[row], self.linearMomenta[row], self.angularMomenta[row] = diagnostics
+
+        self.buffered += 1
+
+        if self.buffered == self.chunkSize:
+            self.flush()
+
+    def flush(self, text = True):
+        """
+
+        Writes all buffered steps to the files and empties the buffers.
+
+            Parameters:
+                text (bool): Whether the steps are also written to the text files.
+
+        """
+        rows = self.buffered
+
+        if rows == 0:
+            return
+
+        profiler = self.system.profiler
+
+        if self.text and text:
+            for i, f in enumerate(self.bodyFiles):
+                profiler.count('bytes written', f.write(format_rows(self.positions[:rows, i])))
+
+            profiler.count('bytes written', self.energyFile.write(format_rows(self.energies[:rows])))
+            profiler.count('bytes written', self.LMFile.write(format_rows(self.linearMomenta[:rows])))
+            profiler.count('bytes written', self.AMFile.write(format_rows(self.angularMomenta[:rows])))
+
+        if self.binary:
+            #Appends the raw positions, then updates the step count in the header so the file is always readable.
+            profiler.count('bytes written', self.binaryFile.write(self.positions[:rows].astype('<f8').tobytes()))
+            self.stored += rows
+
+            end = self.binaryFile.tell()
+            self.binaryFile.seek(0)
+            self.binaryFile.write(npy_header((self.stored, len(self.names), 3)))
+            self.binaryFile.seek(end)
+            self.binaryFile.flush()
+
+        self.buffered = 0
+
+    def offsets(self):
+        """
+
+        Writes out every buffered step and returns how far through the run the files are, so a resumed run can carry on
+        from exactly this point.
+
+            Returns:
+                offsets (dict): The steps recorded, the steps stored in the binary store, and the size of each text
+                file and of the binary store, in bytes.
+
+        """
+        self.flush()
+
+        for f in self.textFiles:
+            f.flush()
+
+        return({
+            'steps': self.steps,
+            'stored': self.stored,
+            'textOffsets': np.array([f.tell() for f in self.textFiles], dtype = np.int64),
+            'binaryOffset': self.binaryFile.tell() if self.binary else 0,
+        })
+
+    def close(self):
+        """
+
+        Flushes the buffers and closes every file. Closing more than once does nothing.
+
+        """
+        if self.closed:
+            return
+
+        #Keeps the final state if it fell between outputs.
+        if self.steps % self.stride != 0:
+            self.store(self.system)
+
+        self.flush()
+
+        for f in self.textFiles:
+            f.close()
+
+        if self.binary:
+            self.binaryFile.close()
+
+        self.closed = True
+        atexit.unregister(self.close)
+
+
+def save_checkpoint(system, step, accumulator, writer, header, directory = 'ephemeride_data', integratorState = None):
+    """
+
+    Saves everything needed to carry on the run from this point to directory/checkpoint.npz.
+
+    The file is written under a temporary name and then moved over the old checkpoint, so a run killed while saving
+    always leaves the previous checkpoint whole.
+
+        Parameters:
+            system (System): Contains all Particle instances defined for the system.
+
+            step (int): The number of steps, or adaptive outputs, completed.
+
+            accumulator (ConservationAccumulator): The running statistics of the conserved quantities.
+
+            writer (TrajectoryWriter): The writer of the run's files, which is flushed.
+
+            header (dict): The run parameters, checked against those of the resumed run.
+
+            directory (str): The folder the checkpoint is written to.
+
+            integratorState (dict): The state of the adaptive integrator, see Integrators.integrate_adaptive, or None.
+
+    """
+    arrays = {
+        'names': np.array(system.names),
+        'positions': system.positions,
+        'velocities': system.velocities,
+        'accelerations': system.accelerations,
+        'step': step,
+        'header': json.dumps(header),
+    }
+
+    for key, value in accumulator.state().items():
+        arrays['accumulator_' + key] = value
+
+    for key, value in writer.offsets().items():
+        arrays['writer_' + key] = value
+
+    for key, value in (integratorState or {}).items():
+        arrays['integrator_' + key] = value
+
+    fileName = os.path.join(directory, 'checkpoint.npz')
+    np.savez(fileName + '.tmp', **arrays)
+    os.replace(fileName + '.tmp.npz', fileName)
+
+def load_checkpoint(directory = 'ephemeride_data'):
+    """
+
+    Reads the checkpoint saved by save_checkpoint, if there is one.
+
+        Parameters:
+            directory (str): The folder containing checkpoint.npz.
+
+        Returns:
+            checkpoint (dict): The saved state, with the 'accumulator', 'writer' and 'integrator' states as dictionaries
+            of their own, or None if there is no checkpoint.
+
+    """
+    fileName = os.path.join(directory, 'checkpoint.npz')
+
+    if not os.path.isfile(fileName):
+        return(None)
+
+    checkpoint = {'accumulator': {}, 'writer': {}, 'integrator': {}}
+
+    with np.load(fileName) as arrays:
+        for key in arrays.files:
+            for prefix in ['accumulator', 'writer', 'integrator']:
+                if key.startswith(prefix + '_'):
+                    checkpoint[prefix][key[len(prefix) + 1:]] = arrays[key]
+                    break
+            else:
+                checkpoint[key] = arrays[key]
+
+    checkpoint['names'] = checkpoint['names'].tolist()
+    checkpoint['step'] = int(checkpoint['step'])
+    checkpoint['header'] = json.loads(str(checkpoint['header']))
+
+    return(checkpoint)
+
+def clear_checkpoint(directory = 'ephemeride_data'):
+    """
+
+    Deletes the checkpoint once a run has finished, so a later resume starts a new run rather than repeating the end.
+
+        Parameters:
+            directory (str): The folder containing checkpoint.npz.
+
+    """
+    fileName = os.path.join(directory, 'checkpoint.npz')
+
+    if os.path.isfile(fileName):
+        os.remove(fileName)
+
+def load_trajectory(directory = 'ephemeride_data'):
+    """
+
+    Opens the binary trajectory store as a read-only memory map, so only the slices that are used are read from disk.
+
+        Parameters:
+            directory (str): The folder containing trajectory.npy and trajectory.json.
+
+        Returns:
+            header (dict): The run parameters, body names and colours.
+
+            positions (array-like): The (steps, N, 3) array of positions.
+
+    """
+    f = open(os.path.join(directory, 'trajectory.json'), 'r')
+    header = json.load(f)
+    f.close()
+
+    positions = np.load(os.path.join(directory, 'trajectory.npy'), mmap_mode = 'r')
+
+    return(header, positions)
+
+def trajectory_to_text(directory = 'ephemeride_data', outputDirectory = None, chunkSize = 10000):
+    """
+
+    Converts the binary trajectory store into the text ephemeride files, one name.txt per body.
+
+        Parameters:
+            directory (str): The folder containing the binary trajectory store.
+
+            outputDirectory (str): The folder the text files are written to, by default the same folder.
+
+            chunkSize (int): The number of steps converted at once.
+
     """
+    header, positions = load_trajectory(directory)
+
+    if outputDirectory is None:
+        outputDirectory = directory
+
+    for i, name in enumerate(header['names']):
+        f = open(os.path.join(outputDirectory, name + '.txt'), 'w')
 
-    Turns the position data from ephemeride_data into usable data for pyplot.
+        #Converts a chunk at a time so the whole trajectory is never loaded.
+        for first in range(0, len(positions), chunkSize):
+            f.write(format_rows(positions[first:first + chunkSize, i]))
+
+        f.close()
+
+def scrape_position_data(system, directory = 'ephemeride_data'):
+    """
+
+    Turns the position data from ephemeride_data, or another folder, into usable data for pyplot.
 
         Parameters:
             system(list-like): Contains all Particle instances defined for the system.
 
+            directory (str): The folder the files are read from.
+
         Returns:
             dataList(list-like): Contains all position vectors at every time for all bodies in the system.
 
@@ -183,7 +741,7 @@ def scrape_position_data(system):
         bodyList = []
 
         #Opens and reads the file.
-        fileName = 'ephemeride_data/' + body.name + '.txt'
+        fileName = directory + '/' + body.name + '.txt'
         f = open(fileName, 'r')
             
         #Splits the file by line and removes trailing newline characters.
@@ -204,7 +762,86 @@ def scrape_position_data(system):
 
     return dataList
 
-def update_summary(dE, E, dL, L, dp, p):
+def update_drift_summary(accumulator, directory = 'ephemeride_data'):
+    """
+
+    Updates the summary file with the largest drift and the variance of each conserved quantity.
+
+        Parameters:
+            accumulator (ConservationAccumulator): The running statistics of the conserved quantities.
+
+            directory (str): The folder the files are written to.
+
+    """
+    #Formats the summary text for the drift data.
+    summary = ('Maximum drift in energy:' + str(accumulator.energy.maxDrift) + '\n' +
+        'Variance of energy:' + str(accumulator.energy.variance()) + '\n' +
+
+        'Maximum drift in angular momentum:' + str(accumulator.angularMomentum.maxDrift) + '\n' +
+        'Variance of angular momentum:' + str(accumulator.angularMomentum.variance()) + '\n' +
+
+        'Maximum drift in linear momentum:' + str(accumulator.linearMomentum.maxDrift) + '\n' +
+        'Variance of linear momentum:' + str(accumulator.linearMomentum.variance()) + '\n'
+    )
+
+    #Opens the file in 'append' mode, writes the data and closes it.
+    f = open(directory + '/!summary_file.txt', 'a')
+    f.write(summary)
+    f.close()
+
+def update_profile_summary(profiler, directory = 'ephemeride_data'):
+    """
+
+    Updates the summary file with the time spent in each phase of the run and the counters, largest first.
+
+        Parameters:
+            profiler (PhaseProfiler): The timings and counters of the run.
+
+            directory (str): The folder the files are written to.
+
+    """
+    elapsed = profiler.elapsed
+
+    summary = ('Profiled steps:' + str(profiler.steps) + '\n' +
+        'Profiled time (s):' + str(elapsed) + '\n' +
+        'Mean step time (s):' + str(elapsed / max(profiler.steps, 1)) + '\n' +
+        'Shortest step time (s):' + str(profiler.shortestStep if profiler.steps else 0.0) + '\n' +
+        'Longest step time (s):' + str(profiler.longestStep) + '\n'
+    )
+
+    #Any time not inside a phase is shown as 'other'.
+    totals = dict(profiler.totals)
+    totals['other'] = max(elapsed - sum(totals.values()), 0.0)
+
+    for name in sorted(totals, key = totals.get, reverse = True):
+        summary += ('Time in ' + name + ' (s):' + str(totals[name]) + ' (' +
+            format(100 * totals[name] / elapsed if elapsed else 0.0, '.1f') + '%)\n')
+
+    for name in sorted(profiler.counters):
+        summary += name[0].upper() + name[1:] + ':' + str(profiler.counters[name]) + '\n'
+
+    f = open(directory + '/!summary_file.txt', 'a')
+    f.write(summary)
+    f.close()
+
+def update_step_summary(accepted, rejected, directory = 'ephemeride_data'):
+    """
+
+    Updates the summary file with the number of steps taken by the adaptive algorithm.
+
+        Parameters:
+            accepted (int): The number of accepted steps.
+
+            rejected (int): The number of rejected steps.
+
+            directory (str): The folder the files are written to.
+
+    """
+    f = open(directory + '/!summary_file.txt', 'a')
+    f.write('Accepted adaptive steps:' + str(accepted) + '\n' + 'Rejected adaptive steps:' + str(rejected) + '\n')
+    f.close()
+
+def update_summary(dE, E, dL, L, dp, p, directory = 'ephemeride_data'):
     """
 
     Updates the summary file with the conservation data.
@@ -221,9 +858,11 @@ def update_summary(dE, E, dL, L, dp, p):
             dp (float): The average change in total linear momentum.
 
             p (float): The initial total linear momentum.
+
+            directory (str): The folder the files are written to.
     """
     #Sets the file name.
-    fileName = 'ephemeride_data/!summary_file.txt'
+    fileName = directory + '/!summary_file.txt'
 
     #Opens the file in 'append' mode.
     f = open(fileName, 'a')
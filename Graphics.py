@@ -2,10 +2,29 @@
 
 Handles the graphing aspect of the code.
 
+matplotlib is only imported when something is plotted, so runs that never plot don't pay for it.
+
+Long trajectories are cut down to a few thousand points per body before plotting, which is more than the screen can
+show, either by taking every n-th point or by keeping the points that matter most to the shape of the path.
+
+Plots and animations can also be rendered straight from a run's trajectory store without a display, using the Agg
+backend, i.e. for every case of a sweep on a headless machine:
+
+    python Graphics.py sweeps/* --plot orbits.png --animate orbits.mp4
+
+Animation frames are rendered in a pool of worker processes and encoded as they arrive, which needs imageio (and
+imageio-ffmpeg for MP4s).
+
 """
 
-from matplotlib import pyplot as plt
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+from Files import load_trajectory
+
+#The data every animation worker draws its frames from, set once per worker by set_frame_data.
+_frameData = None
 
 def data_setup(bodyList):
     """
@@ -13,7 +32,7 @@ def data_setup(bodyList):
     Reformats the data list so it is organised by x, y, z rather than by each time.
 
         Parameters:
-            bodyList (list-like): The list of position data for the current body
+            bodyList (list-like): The list or (steps, 3) array of position data for the current body
 
         Returns:
             xs (list-like): The past x-coordinates of the body
@@ -23,24 +42,159 @@ def data_setup(bodyList):
             zs (listlike): The past z-coordinates of the body
 
     """
-    #Initialises lists for the x, y and z coordinates.
-    xs = []
-    ys = []
-    zs = []
+    #Takes each coordinate as a column of the (steps, 3) array.
+    points = np.asarray(bodyList)
+
+    return (points[:, 0], points[:, 1], points[:, 2])
+
+
+def stride_indices(length, maxPoints):
+    """
+
+    Picks evenly spaced steps, always including the first and last.
+
+        Parameters:
+            length (int): The number of steps.
+
+            maxPoints (int): The most steps to pick.
+
+        Returns:
+            indices (array-like): The picked steps, in order.
+
+    """
+    if length <= maxPoints:
+        return(np.arange(length))
+
+    return(np.unique(np.linspace(0, length - 1, maxPoints).round().astype(int)))
+
+def lttb_indices(points, maxPoints):
+    """
 
-    #Chooses each point in the body data.
-    for point in bodyList:
+    Picks the steps that best keep the shape of a 3-D path, using the largest-triangle-three-buckets method.
 
-        #Adds each coordinate to the corresponding list
-        xs.append(point[0])
-        ys.append(point[1])
-        zs.append(point[2])
+    The steps are split into maxPoints - 2 buckets between the first and last step. From each bucket, the step kept is
+    the one making the largest triangle with the step kept from the previous bucket and the average of the next bucket,
+    so sharp turns, i.e. the Moon's loops around the Earth, survive where a plain stride would cut across them.
 
+        Parameters:
+            points (array-like): The (steps, 3) array of positions.
 
-    return (xs, ys, zs)
+            maxPoints (int): The most steps to pick.
 
+        Returns:
+            indices (array-like): The picked steps, in order.
 
-def plot(system, dataList):
+    """
+    points = np.asarray(points, dtype = float)
+    length = len(points)
+
+    if length <= maxPoints or maxPoints < 3:
+        return(stride_indices(length, maxPoints))
+
+    #The edges of the buckets for every step between the first and last.
+    edges = np.linspace(1, length - 1, maxPoints - 1).astype(int)
+
+    indices = np.empty(maxPoints, dtype = int)
+    indices[0] = 0
+    indices[-1] = length - 1
+
+    for bucket in range(maxPoints - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        #The average of the next bucket, or the last step after the final bucket.
+        if bucket + 2 < len(edges):
+            following = points[edges[bucket + 1]:edges[bucket + 2]].mean(axis = 0)
+        else:
+            following = points[-1]
+
+        previous = points[indices[bucket]]
+
+        #Twice the area of each triangle, from the cross product of two of its sides.
+        areas = np.linalg.norm(np.cross(points[start:end] - previous, following - previous), axis = 1)
+        indices[bucket + 1] = start + np.argmax(areas)
+
+    return(indices)
+
+def downsample(bodyList, maxPoints = 2000, method = 'lttb'):
+    """
+
+    Cuts a body's positions down to at most maxPoints steps for plotting.
+
+    Only the picked steps are read, so a memory-mapped trajectory (see Files.load_trajectory) is never loaded whole.
+    For 'lttb', a trajectory much longer than maxPoints is first thinned by a stride, to at most 10 points per bucket.
+
+        Parameters:
+            bodyList (array-like): The (steps, 3) positions of the body.
+
+            maxPoints (int): The most steps kept.
+
+            method (str): 'lttb' to keep the shape of the path, 'stride' for evenly spaced steps, or None for every step.
+
+        Returns:
+            points (array-like): The (M, 3) array of positions kept.
+
+    """
+    if method is None:
+        return(np.asarray(bodyList))
+
+    if method == 'stride':
+        return(np.asarray(bodyList[stride_indices(len(bodyList), maxPoints)]))
+
+    if method != 'lttb':
+        raise ValueError("Downsampling method must be 'lttb', 'stride' or None")
+
+    #Reads at most ten points per bucket from the stored trajectory.
+    thinned = np.asarray(bodyList[stride_indices(len(bodyList), 10 * maxPoints)])
+
+    return(thinned[lttb_indices(thinned, maxPoints)])
+
+
+def draw(ax, colours, trails):
+    """
+
+    Draws each body's trail, and the body itself at the end of it, onto a 3-D axis.
+
+        Parameters:
+            ax (Axes3D): The axis to draw on.
+
+            colours (list-like): The colour of each body.
+
+            trails (list-like): The (M, 3) array of positions to draw for each body.
+
+    """
+    for colour, trail in zip(colours, trails):
+        #Sets up data lists
+        xs, ys, zs = data_setup(trail)
+
+        #Plots the 'trail' where the planet has been, as a line
+        ax.plot(xs, ys, zs, color = colour, marker = None, linestyle = 'solid', )
+
+        #Plots the planet itself in its final position as a larger point.
+        ax.plot(xs[-1], ys[-1], zs[-1], color = colour, marker = '.')
+
+def agg_figure(size = (8, 8), dpi = 100):
+    """
+
+    Creates a figure drawn by the Agg backend, which needs no display and leaves pyplot's backend alone.
+
+        Parameters:
+            size (tuple): The width and height of the figure in inches.
+
+            dpi (int): The pixels per inch.
+
+        Returns:
+            fig (Figure): The figure.
+
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize = size, dpi = dpi)
+    FigureCanvasAgg(fig)
+
+    return(fig)
+
+def plot(system, dataList, maxPoints = 2000, method = 'lttb', fileName = None):
     """
 
     Plots each body onto the graph.
@@ -48,9 +202,27 @@ def plot(system, dataList):
         Parameters:
             system(list-like): Contains all Particle instances defined for the system.
 
-            dataList(list-like): Contains all position vectors at every time for all bodies in the system.
+            dataList(list-like): Contains all position vectors at every time for all bodies in the system, i.e. the
+            stored trajectory arranged by body.
+
+            maxPoints (int): The most points plotted for each body.
+
+            method (str): How the points are picked, see downsample.
+
+            fileName (str): If given, the graph is saved to this file without a display instead of being shown.
 
     """
+    #Sets up data lists from the points worth plotting
+    trails = [downsample(dataList[i], maxPoints, method) for i in range(len(system))]
+    colours = [body.colour for body in system]
+
+    if fileName is not None:
+        fig = agg_figure()
+        draw(fig.add_subplot(projection = '3d'), colours, trails)
+        fig.savefig(fileName)
+        return
+
+    from matplotlib import pyplot as plt
 
     #Introduces a new figure.
     fig = plt.figure()
@@ -59,15 +231,225 @@ def plot(system, dataList):
     ax = plt.subplot(projection = '3d')
 
     #Plots for every body
-    for i, body in enumerate(system):
-        #Sets up data lists
-        xs, ys, zs = data_setup(dataList[i])
-
-        #Plots the 'trail' where the planet has been, as a line
-        ax.plot(xs, ys, zs, color = body.colour, marker = None, linestyle = 'solid', )
-
-        #Plots the planet itself in its final position as a larger point.
-        ax.plot(xs[-1], ys[-1], zs[-1], color = body.colour, marker = '.')
+    draw(ax, colours, trails)
 
     #Displays the figure
     plt.show()
+
+def save_plot(directory = 'ephemeride_data', fileName = 'orbits.png', maxPoints = 2000, method = 'lttb'):
+    """
+
+    Saves the graph of a finished run from its trajectory store, without a display.
+
+        Parameters:
+            directory (str): The folder containing the trajectory store, which the graph is saved into.
+
+            fileName (str): The name of the image, whose extension picks the format, i.e. .png or .svg.
+
+            maxPoints (int): The most points plotted for each body.
+
+            method (str): How the points are picked, see downsample.
+
+    """
+    header, positions = load_trajectory(directory)
+
+    trails = [downsample(positions[:, i], maxPoints, method) for i in range(len(header['names']))]
+
+    fig = agg_figure()
+    draw(fig.add_subplot(projection = '3d'), header['colours'], trails)
+    fig.savefig(os.path.join(directory, fileName))
+
+def set_frame_data(frameData):
+    """
+
+    Gives a worker process the data its animation frames are drawn from, so it is only sent once per worker.
+
+    """
+    global _frameData
+    _frameData = frameData
+
+def render_frame(frame):
+    """
+
+    Draws one animation frame from the data set by set_frame_data.
+
+        Parameters:
+            frame (int): The number of the frame.
+
+        Returns:
+            image (array-like): The (height, width, 3) array of pixel colours.
+
+    """
+    frameData = _frameData
+    step = frameData['steps'][frame]
+
+    #Each trail runs through the kept points up to this step, ending at the body's position now.
+    trails = []
+    for i, (indices, points) in enumerate(frameData['trails']):
+        keep = indices < step
+        if frameData['trail'] is not None:
+            keep &= indices >= step - frameData['trail']
+
+        trails.append(np.concatenate([points[keep], frameData['positions'][frame, i][np.newaxis]]))
+
+    fig = agg_figure(frameData['size'], frameData['dpi'])
+    ax = fig.add_subplot(projection = '3d')
+    draw(ax, frameData['colours'], trails)
+
+    #Fixes the axes so the view doesn't jump between frames.
+    lower, upper = frameData['limits']
+    ax.set_xlim(lower[0], upper[0])
+    ax.set_ylim(lower[1], upper[1])
+    ax.set_zlim(lower[2], upper[2])
+    ax.set_title('Day ' + format(frameData['times'][frame] / 86400, '.1f'))
+
+    fig.canvas.draw()
+
+    return(np.asarray(fig.canvas.buffer_rgba())[:, :, :3].copy())
+
+def animate(directory = 'ephemeride_data', fileName = 'orbits.mp4', frames = 200, fps = 20, maxPoints = 2000,
+    method = 'lttb', trail = None, workers = None, size = (8, 8), dpi = 100):
+    """
+
+    Saves an animation of a finished run from its trajectory store, without a display.
+
+    Frames are rendered in parallel and written to the file in order as they finish, with only a few at a time held in
+    memory.
+
+        Parameters:
+            directory (str): The folder containing the trajectory store, which the animation is saved into.
+
+            fileName (str): The name of the animation, whose extension picks the format, i.e. .mp4 or .gif.
+
+            frames (int): The most frames, spread evenly through the run.
+
+            fps (float): The frames per second.
+
+            maxPoints (int): The most points kept in each body's trail.
+
+            method (str): How the trail points are picked, see downsample.
+
+            trail (float): How far back the trails reach as a fraction of the run, or None for the whole run.
+
+            workers (int): The number of worker processes, one per core by default, or 1 to render in this process.
+
+            size (tuple): The width and height of each frame in inches.
+
+            dpi (int): The pixels per inch.
+
+    """
+    #imageio is only needed for animations.
+    try:
+        import imageio
+    except ImportError as error:
+        raise ImportError('Animations need imageio installed, and imageio-ffmpeg for MP4s') from error
+
+    header, positions = load_trajectory(directory)
+    length = len(positions)
+
+    #Picks each body's trail points from the whole run once, so every frame only selects from them.
+    trails = []
+    for i in range(len(header['names'])):
+        if method is None:
+            indices = np.arange(length)
+        elif method == 'stride':
+            indices = stride_indices(length, maxPoints)
+        elif method == 'lttb':
+            indices = stride_indices(length, 10 * maxPoints)
+            indices = indices[lttb_indices(positions[indices, i], maxPoints)]
+        else:
+            raise ValueError("Downsampling method must be 'lttb', 'stride' or None")
+
+        trails.append((indices, np.asarray(positions[indices, i])))
+
+    #Only the frames' own positions are read in full.
+    steps = stride_indices(length, frames)
+    points = np.concatenate([points for indices, points in trails])
+
+    #Frames the whole run in a cube, so the view doesn't jump and no axis is squashed.
+    centre = 0.5 * (points.min(axis = 0) + points.max(axis = 0))
+    halfSize = 0.5 * (points.max(axis = 0) - points.min(axis = 0)).max() or 1.0
+
+    frameData = {
+        'steps': steps,
+        'times': steps * header['stride'] * header['deltaT'],
+        'positions': np.asarray(positions[steps]),
+        'trails': trails,
+        'trail': None if trail is None else trail * length,
+        'colours': header['colours'],
+        'limits': (centre - halfSize, centre + halfSize),
+        'size': size,
+        'dpi': dpi,
+    }
+
+    if fileName.lower().endswith('.gif'):
+        writer = imageio.get_writer(os.path.join(directory, fileName), mode = 'I', duration = 1000 / fps, loop = 0)
+    else:
+        writer = imageio.get_writer(os.path.join(directory, fileName), fps = fps)
+
+    workers = workers or os.cpu_count()
+
+    if workers == 1:
+        set_frame_data(frameData)
+        for frame in range(len(steps)):
+            writer.append_data(render_frame(frame))
+
+    else:
+        with ProcessPoolExecutor(max_workers = workers, initializer = set_frame_data, initargs = (frameData,)) as executor:
+            #Keeps a few frames queued per worker, and writes each one as soon as it and those before it are done.
+            window = 2 * workers
+            pending = [executor.submit(render_frame, frame) for frame in range(min(window, len(steps)))]
+
+            for frame in range(len(steps)):
+                image = pending.pop(0).result()
+
+                if frame + window < len(steps):
+                    pending.append(executor.submit(render_frame, frame + window))
+
+                writer.append_data(image)
+
+    writer.close()
+
+def render(directories, plotFile = 'orbits.png', animationFile = None, **options):
+    """
+
+    Saves the graph and/or animation of several finished runs, i.e. every case of a sweep.
+
+        Parameters:
+            directories (list-like): The folders containing each run's trajectory store.
+
+            plotFile (str): The name of the image saved in each folder, or None for no image.
+
+            animationFile (str): The name of the animation saved in each folder, or None for no animation.
+
+            options (dict): Passed on to animate, i.e. frames or workers.
+
+    """
+    for directory in directories:
+        print('Rendering ' + directory)
+
+        if plotFile is not None:
+            save_plot(directory, plotFile, maxPoints = options.get('maxPoints', 2000),
+                method = options.get('method', 'lttb'))
+
+        if animationFile is not None:
+            animate(directory, animationFile, **options)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Renders finished runs without a display.')
+    parser.add_argument('directories', nargs = '+', help = 'the folders containing each run\'s trajectory store')
+    parser.add_argument('--plot', default = None, help = 'the name of the image saved in each folder, i.e. orbits.png')
+    parser.add_argument('--animate', default = None, help = 'the name of the animation saved in each folder, i.e. orbits.mp4')
+    parser.add_argument('--frames', type = int, default = 200, help = 'the most frames in each animation')
+    parser.add_argument('--fps', type = float, default = 20, help = 'the frames per second of each animation')
+    parser.add_argument('--points', type = int, default = 2000, help = 'the most points plotted for each body')
+    parser.add_argument('--trail', type = float, default = None, help = 'the length of the animated trails as a fraction of the run')
+    parser.add_argument('--workers', type = int, default = None, help = 'the number of worker processes rendering frames')
+    options = parser.parse_args()
+
+    #Only folders with a trajectory store are rendered, so a sweep's folder can be given with a wildcard.
+    directories = [directory for directory in options.directories if os.path.exists(os.path.join(directory, 'trajectory.npy'))]
+
+    render(directories, plotFile = options.plot, animationFile = options.animate, frames = options.frames,
+        fps = options.fps, maxPoints = options.points, trail = options.trail, workers = options.workers)
@@ -0,0 +1,881 @@
+"""
+
+Contains the approximation algorithms that advance a whole System by one time step, and the registry used to pick one.
+
+Every algorithm works on the System's (N, 3) arrays and declares how many force calculations it needs per step. The
+accelerations in the System are always left matching the positions at the end of the step where the algorithm has
+calculated them, so the next step can reuse them through the System's cache.
+
+It also contains integrate_adaptive, which chooses its own step lengths instead of using a fixed deltaT.
+
+"""
+
+import numpy as np
+
+class Integrator:
+    """
+
+    An approximation algorithm that can be chosen for a run.
+
+        Attributes:
+            number (int): The number used to choose the algorithm in the menu.
+
+            name (str): The name used to choose the algorithm.
+
+            forceEvaluations (int): The number of force calculations the algorithm needs per step.
+
+            method (function): Advances a System by one step, taking (system, deltaT).
+
+        Methods:
+            step(system, deltaT): Advances the system by one step.
+
+    """
+
+    def __init__(self, number, name, forceEvaluations, method):
+        """
+
+        Initialises a new Integrator instance.
+
+        """
+        self.number = number
+        self.name = name
+        self.forceEvaluations = forceEvaluations
+        self.method = method
+
+    def __str__(self):
+        return "Integrator {0}: {1}, {2} force evaluation(s) per step".format(self.number, self.name, self.forceEvaluations)
+
+    def step(self, system, deltaT):
+        """
+
+        Advances the system by one step.
+
+            Parameters:
+                system (System): Contains all Particle instances defined for the system.
+
+                deltaT (int/float): The time interval across which the system moves.
+
+        """
+        self.method(system, deltaT)
+
+
+#Stores every Integrator by its number.
+registry = {}
+
+def register(number, name, forceEvaluations):
+    """
+
+    Adds the decorated function to the registry as a new Integrator.
+
+        Parameters:
+            number (int): The number used to choose the algorithm in the menu.
+
+            name (str): The name used to choose the algorithm.
+
+            forceEvaluations (int): The number of force calculations the algorithm needs per step.
+
+    """
+    def decorator(method):
+        registry[number] = Integrator(number, name, forceEvaluations, method)
+        return method
+
+    return decorator
+
+def get_integrator(algorithm):
+    """
+
+    Finds an Integrator from its number or name.
+
+        Parameters:
+            algorithm (int/str): The number, i.e. 3 or '3', or the name, i.e. 'euler_richardson', of the algorithm.
+
+        Returns:
+            integrator (Integrator): The chosen algorithm.
+
+    """
+    if isinstance(algorithm, str) and algorithm.strip().isdigit():
+        algorithm = int(algorithm)
+
+    if algorithm in registry:
+        return registry[algorithm]
+
+    for integrator in registry.values():
+        if integrator.name == algorithm:
+            return integrator
+
+    raise ValueError('Algorithm must be one of: ' + ', '.join(str(number) + ' (' + registry[number].name + ')'
+        for number in sorted(registry)))
+
+
+@register(1, 'euler', 1)
+def euler(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using the Euler algorithm.
+
+    """
+    system.update_accelerations()
+
+    system.positions += system.velocities * deltaT
+    system.velocities += system.accelerations * deltaT
+    system.moved()
+
+@register(2, 'euler_cromer', 1)
+def euler_cromer(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using the Euler-Cromer algorithm.
+
+    """
+    system.update_accelerations()
+
+    system.positions += system.velocities * deltaT
+    system.velocities += system.accelerations * deltaT
+    system.moved()
+
+@register(3, 'euler_richardson', 2)
+def euler_richardson(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using the Euler-Richardson algorithm.
+
+    """
+    system.update_accelerations()
+
+    #Estimates the midpoint velocities and positions of every body.
+    v_mid = system.velocities + 0.5*(system.accelerations * deltaT)
+    r_mid = system.positions + 0.5*(system.velocities * deltaT)
+
+    #Calculates the midpoint accelerations from the midpoint positions.
+    a_mid = system.calculate_accelerations(r_mid)
+
+    system.velocities += a_mid * deltaT
+    system.positions += v_mid * deltaT
+    system.moved()
+
+@register(4, 'leapfrog', 1)
+def leapfrog(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using the kick-drift-kick leapfrog algorithm.
+
+    The acceleration at the end of the step is cached, so it is reused as the start of the next step and the method
+    only needs one force calculation per step.
+
+    """
+    #Half kick with the accelerations at the start of the step.
+    system.update_accelerations()
+    system.velocities += 0.5*(system.accelerations * deltaT)
+
+    #Full drift with the half-step velocities.
+    system.positions += system.velocities * deltaT
+    system.moved()
+
+    #Half kick with the accelerations at the end of the step.
+    system.update_accelerations()
+    system.velocities += 0.5*(system.accelerations * deltaT)
+
+@register(5, 'rk4', 4)
+def rk4(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using the classical fourth-order Runge-Kutta algorithm.
+
+    """
+    system.update_accelerations()
+
+    #The slopes of the positions (k_x) and velocities (k_v) at the four stages.
+    k1_x = system.velocities.copy()
+    k1_v = system.accelerations.copy()
+
+    k2_x = system.velocities + 0.5 * deltaT * k1_v
+    k2_v = system.calculate_accelerations(system.positions + 0.5 * deltaT * k1_x)
+
+    k3_x = system.velocities + 0.5 * deltaT * k2_v
+    k3_v = system.calculate_accelerations(system.positions + 0.5 * deltaT * k2_x)
+
+    k4_x = system.velocities + deltaT * k3_v
+    k4_v = system.calculate_accelerations(system.positions + deltaT * k3_x)
+
+    system.positions += deltaT / 6 * (k1_x + 2*k2_x + 2*k3_x + k4_x)
+    system.velocities += deltaT / 6 * (k1_v + 2*k2_v + 2*k3_v + k4_v)
+    system.moved()
+
+def composition(system, deltaT, weights):
+    """
+
+    Updates the system by a symmetric sequence of leapfrog steps, each a fraction of deltaT. The kicks between
+    neighbouring steps share one force calculation through the cache.
+
+        Parameters:
+            system (System): Contains all Particle instances defined for the system.
+
+            deltaT (int/float): The time interval across which the system moves.
+
+            weights (list-like): The fraction of deltaT taken by each leapfrog step.
+
+    """
+    for weight in weights:
+        leapfrog(system, weight * deltaT)
+
+#Yoshida's fourth-order 'triple jump' weights.
+yoshida4Weights = [
+    1 / (2 - 2**(1/3)),
+    -2**(1/3) / (2 - 2**(1/3)),
+    1 / (2 - 2**(1/3)),
+]
+
+#Yoshida's sixth-order weights (solution A), applied symmetrically.
+yoshida6Outer = [0.784513610477560, 0.235573213359357, -1.17767998417887]
+yoshida6Weights = yoshida6Outer + [1 - 2*sum(yoshida6Outer)] + yoshida6Outer[::-1]
+
+@register(6, 'yoshida4', 3)
+def yoshida4(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using Yoshida's fourth-order symplectic composition.
+
+    """
+    composition(system, deltaT, yoshida4Weights)
+
+@register(7, 'yoshida6', 7)
+def yoshida6(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using Yoshida's sixth-order symplectic composition.
+
+    """
+    composition(system, deltaT, yoshida6Weights)
+
+@register(8, 'forest_ruth', 3)
+def forest_ruth(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using the fourth-order Forest-Ruth algorithm, in its
+    drift-kick form, which doesn't use the acceleration at the start of the step.
+
+    """
+    theta = 1 / (2 - 2**(1/3))
+
+    drifts = [theta / 2, (1 - theta) / 2, (1 - theta) / 2, theta / 2]
+    kicks = [theta, 1 - 2*theta, theta]
+
+    for i, kick in enumerate(kicks):
+        system.positions += drifts[i] * deltaT * system.velocities
+        system.moved()
+
+        system.update_accelerations()
+        system.velocities += kick * deltaT * system.accelerations
+
+    system.positions += drifts[-1] * deltaT * system.velocities
+    system.moved()
+
+
+def block_levels(system, deltaT, eta = 0.02, maxLevel = 8):
+    """
+
+    Picks a power-of-two time step level for every body, so that body i moves in steps of deltaT / 2**level[i].
+
+    Each body's ideal step is eta*|a|/|j|, from the acceleration a and jerk j of its fastest-changing significant
+    interaction (see System.field_timescales), rounded down to the nearest level.
+
+        Parameters:
+            system (System): Contains all Particle instances defined for the system.
+
+            deltaT (int/float): The longest step, taken by level 0.
+
+            eta (float): The accuracy parameter; smaller values give shorter steps.
+
+            maxLevel (int): The deepest level, so the shortest step is deltaT / 2**maxLevel.
+
+        Returns:
+            levels (array-like): The (N,) array of levels.
+
+    """
+    idealSteps = eta * system.timescales()
+
+    #Bodies whose acceleration doesn't change, i.e. alone, can take the longest step.
+    with np.errstate(divide = 'ignore'):
+        levels = np.ceil(np.log2(deltaT / idealSteps))
+
+    return(np.clip(np.nan_to_num(levels, nan = 0, neginf = 0), 0, maxLevel).astype(int))
+
+@register(9, 'block', 2)
+def block_leapfrog(system, deltaT, eta = 0.02, maxLevel = 8):
+    """
+
+    Updates the positions and velocities of every body using velocity Verlet (leapfrog) steps of a different length
+    for each body, chosen from the powers of two deltaT / 2**level.
+
+    Between its own steps each body follows the quadratic x0 + v0*t + a0*t^2/2 from the start of its step, which lands
+    exactly on the leapfrog result at the end of the step, so the bodies on short steps feel the others moving along
+    their curved paths. The forces are only calculated for the bodies whose step ends on a given substep. All bodies
+    are synchronised at the end of deltaT, where their levels are chosen again. The two full force calculations are
+    the timescales used to pick the levels and the synchronised accelerations at the end; the substeps add partial
+    ones.
+
+        Parameters:
+            system (System): Contains all Particle instances defined for the system.
+
+            deltaT (int/float): The longest step, which every body's step divides into.
+
+            eta (float): The accuracy parameter; smaller values give shorter steps.
+
+            maxLevel (int): The deepest level, so the shortest step is deltaT / 2**maxLevel.
+
+    """
+    system.update_accelerations()
+    levels = block_levels(system, deltaT, eta, maxLevel)
+
+    #The substep is the shortest step actually in use.
+    deepest = levels.max()
+    substeps = 2**deepest
+    substep = deltaT / substeps
+
+    #The number of substeps in each body's own step, and its length.
+    periods = 2**(deepest - levels)
+    bodySteps = (periods * substep)[:, np.newaxis]
+
+    #The state of every body at the start of its current step.
+    startPositions = system.positions.copy()
+    startVelocities = system.velocities.copy()
+    startAccelerations = system.accelerations.copy()
+    startSubsteps = np.zeros(len(system), dtype = int)
+
+    for k in range(substeps):
+        #Moves every body along its predicted path.
+        elapsed = ((k + 1 - startSubsteps) * substep)[:, np.newaxis]
+        system.positions[:] = startPositions + startVelocities * elapsed + 0.5 * startAccelerations * elapsed**2
+        system.moved()
+
+        #Finishes the steps ending now, with forces only for those bodies.
+        finishing = np.nonzero((k + 1) % periods == 0)[0]
+
+        if len(finishing) == len(system):
+            system.update_accelerations()
+            endAccelerations = system.accelerations[finishing]
+
+        else:
+            endAccelerations = system.accelerations_of(finishing)
+
+        system.velocities[finishing] = startVelocities[finishing] + 0.5 * bodySteps[finishing] * (
+            startAccelerations[finishing] + endAccelerations)
+
+        #Starts the next step of those bodies.
+        startPositions[finishing] = system.positions[finishing]
+        startVelocities[finishing] = system.velocities[finishing]
+        startAccelerations[finishing] = endAccelerations
+        startSubsteps[finishing] = k + 1
+
+
+def stumpff(z):
+    """
+
+    Calculates the Stumpff functions c2(z) and c3(z) used by the universal-variable Kepler solver, for elliptic (z > 0)
+    and hyperbolic (z < 0) orbits alike.
+
+        Parameters:
+            z (array-like): The (N,) array of alpha * chi^2 values.
+
+        Returns:
+            c2 (array-like), c3 (array-like): The two Stumpff functions.
+
+    """
+    z = np.asarray(z, dtype = float)
+    root = np.sqrt(np.abs(z))
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+        c2 = np.where(z > 0, (1 - np.cos(root)) / z, (np.cosh(root) - 1) / -z)
+        c3 = np.where(z > 0, (root - np.sin(root)) / (z * root), (np.sinh(root) - root) / (-z * root))
+
+    #The closed forms lose all their precision near z = 0, so the series is used there instead.
+    isSmall = np.abs(z) < 1e-2
+    c2[isSmall] = 1/2 - z[isSmall]/24 + z[isSmall]**2/720 - z[isSmall]**3/40320
+    c3[isSmall] = 1/6 - z[isSmall]/120 + z[isSmall]**2/5040 - z[isSmall]**3/362880
+
+    return(c2, c3)
+
+def kepler_drift(positions, velocities, mu, deltaT, tolerance = 1e-13, maxIterations = 50):
+    """
+
+    Moves every body along its two-body Kepler orbit about a fixed centre, using universal variables so that elliptic,
+    parabolic and hyperbolic orbits are all handled the same way.
+
+    The universal anomaly chi of every body is found together by Laguerre's method, which converges from the simple
+    first guess for any orbit, and the f and g functions then give the new state.
+
+        Parameters:
+            positions (array-like): The (N, 3) array of positions relative to the centre.
+
+            velocities (array-like): The (N, 3) array of velocities.
+
+            mu (float): G times the mass of the centre.
+
+            deltaT (int/float): The time interval across which the bodies move.
+
+            tolerance (float): The largest relative change in chi accepted as converged.
+
+            maxIterations (int): The most iterations allowed before giving up.
+
+        Returns:
+            positions (array-like), velocities (array-like): The new state of every body.
+
+    """
+    r0 = np.linalg.norm(positions, axis = 1)
+    sqrtMu = np.sqrt(mu)
+
+    #sigma0 = r.v / sqrt(mu) and alpha = 1/a, the inverse semi-major axis.
+    sigma0 = np.einsum('ij,ij->i', positions, velocities) / sqrtMu
+    alpha = 2 / r0 - np.einsum('ij,ij->i', velocities, velocities) / mu
+
+    chi = sqrtMu * deltaT / r0
+    n = 5
+
+    for iteration in range(maxIterations):
+        z = alpha * chi**2
+        c2, c3 = stumpff(z)
+
+        #Kepler's equation in universal variables, F(chi) = 0, and its first two derivatives.
+        F = sigma0 * chi**2 * c2 + (1 - alpha * r0) * chi**3 * c3 + r0 * chi - sqrtMu * deltaT
+        dF = sigma0 * chi * (1 - z * c3) + (1 - alpha * r0) * chi**2 * c2 + r0
+        ddF = sigma0 * (1 - z * c2) + (1 - alpha * r0) * chi * (1 - z * c3)
+
+        root = np.sqrt(np.abs((n - 1)**2 * dF**2 - n * (n - 1) * F * ddF))
+        change = n * F / (dF + np.sign(dF) * root)
+        chi = chi - change
+
+        if np.all(np.abs(change) <= tolerance * np.maximum(np.abs(chi), 1e-300)):
+            break
+
+    else:
+        raise ValueError('Kepler drift did not converge in ' + str(maxIterations) + ' iterations')
+
+    z = alpha * chi**2
+    c2, c3 = stumpff(z)
+    r = sigma0 * chi * (1 - z * c3) + (1 - alpha * r0) * chi**2 * c2 + r0
+
+    #The Lagrange f and g functions and their time derivatives.
+    f = 1 - chi**2 / r0 * c2
+    g = deltaT - chi**3 / sqrtMu * c3
+    fDot = sqrtMu / (r * r0) * chi * (z * c3 - 1)
+    gDot = 1 - chi**2 / r * c2
+
+    newPositions = f[:, np.newaxis] * positions + g[:, np.newaxis] * velocities
+    newVelocities = fDot[:, np.newaxis] * positions + gDot[:, np.newaxis] * velocities
+
+    return(newPositions, newVelocities)
+
+def to_democratic_heliocentric(positions, velocities, masses, central):
+    """
+
+    Converts barycentric positions and velocities, i.e. those from data.jpl_scrape, into democratic heliocentric
+    coordinates: positions relative to the central body and velocities relative to the barycentre.
+
+        Parameters:
+            positions (array-like): The (N, 3) array of positions.
+
+            velocities (array-like): The (N, 3) array of velocities.
+
+            masses (array-like): The (N,) array of masses, zero for passive bodies.
+
+            central (int): The index of the central body, i.e. the Sun.
+
+        Returns:
+            heliocentricPositions (array-like): The (N, 3) positions relative to the central body, zero for itself.
+
+            barycentricVelocities (array-like): The (N, 3) velocities relative to the barycentre.
+
+            barycentre (array-like): The position of the centre of mass.
+
+            barycentreVelocity (array-like): The velocity of the centre of mass.
+
+    """
+    totalMass = masses.sum()
+    barycentre = masses @ positions / totalMass
+    barycentreVelocity = masses @ velocities / totalMass
+
+    heliocentricPositions = positions - positions[central]
+    barycentricVelocities = velocities - barycentreVelocity
+
+    return(heliocentricPositions, barycentricVelocities, barycentre, barycentreVelocity)
+
+def from_democratic_heliocentric(heliocentricPositions, barycentricVelocities, barycentre, barycentreVelocity, masses,
+    central):
+    """
+
+    Converts democratic heliocentric coordinates back into barycentric positions and velocities. The central body's
+    own entries are ignored, and it is placed so that the centre of mass is where it should be.
+
+        Parameters:
+            heliocentricPositions (array-like): The (N, 3) positions relative to the central body.
+
+            barycentricVelocities (array-like): The (N, 3) velocities relative to the barycentre.
+
+            barycentre (array-like): The position of the centre of mass.
+
+            barycentreVelocity (array-like): The velocity of the centre of mass.
+
+            masses (array-like): The (N,) array of masses, zero for passive bodies.
+
+            central (int): The index of the central body.
+
+        Returns:
+            positions (array-like), velocities (array-like): The (N, 3) barycentric state.
+
+    """
+    others = np.arange(len(masses)) != central
+
+    centralPosition = barycentre - masses[others] @ heliocentricPositions[others] / masses.sum()
+    positions = heliocentricPositions + centralPosition
+    positions[central] = centralPosition
+
+    velocities = barycentricVelocities + barycentreVelocity
+    velocities[central] = barycentreVelocity - masses[others] @ barycentricVelocities[others] / masses[central]
+
+    return(positions, velocities)
+
+def interaction_accelerations(system, central):
+    """
+
+    Calculates the accelerations of every body due to every body except the central one, from the System's (cached)
+    accelerations. The central body's own entry is zero.
+
+    """
+    accelerations = system.current_accelerations().copy()
+
+    displacements = system.positions[central] - system.positions
+    distances = np.linalg.norm(displacements, axis = 1)
+    distances[central] = np.inf
+
+    accelerations -= system.G * system.masses[central] * displacements / distances[:, np.newaxis]**3
+    accelerations[central] = 0
+
+    return(accelerations)
+
+@register(10, 'wisdom_holman', 1)
+def wisdom_holman(system, deltaT):
+    """
+
+    Updates the positions and velocities of every body using the Wisdom-Holman mapping in democratic heliocentric
+    coordinates, for systems dominated by one central body such as the Sun.
+
+    The motion about the central body is solved exactly by kepler_drift, so the step only has to resolve the much
+    weaker pulls of the other bodies on each other, applied as kicks either side of the drift. The central body is
+    the most massive one.
+
+    """
+    #Passive bodies have no momentum and don't move the barycentre.
+    masses = np.where(system.passive, 0.0, system.masses)
+    central = int(np.argmax(masses))
+    others = np.arange(len(system)) != central
+    mu = system.G * masses[central]
+
+    Q, u, barycentre, barycentreVelocity = to_democratic_heliocentric(system.positions, system.velocities, masses,
+        central)
+
+    #Half kick from the interactions between the other bodies.
+    u += 0.5 * deltaT * interaction_accelerations(system, central)
+
+    #Half drift from the motion of the central body about the barycentre.
+    Q[others] += 0.5 * deltaT * (masses[others] @ u[others]) / masses[central]
+
+    Q[others], u[others] = kepler_drift(Q[others], u[others], mu, deltaT)
+
+    Q[others] += 0.5 * deltaT * (masses[others] @ u[others]) / masses[central]
+    barycentre = barycentre + barycentreVelocity * deltaT
+
+    system.positions[:], system.velocities[:] = from_democratic_heliocentric(Q, u, barycentre, barycentreVelocity,
+        masses, central)
+    system.moved()
+
+    #Half kick at the end of the step, whose accelerations are kept for the next step.
+    system.update_accelerations()
+    u += 0.5 * deltaT * interaction_accelerations(system, central)
+
+    system.velocities[:] = from_democratic_heliocentric(Q, u, barycentre, barycentreVelocity, masses, central)[1]
+
+
+def encounter_substeps(distances, speeds, perturberMasses, G, deltaT, eta = 0.02, maxSubsteps = 2**16):
+    """
+
+    Picks how many substeps a close encounter needs within deltaT, as the power of two that resolves the shortest of
+    the free-fall time sqrt(d^3/(G*m)) and the crossing time d/v of any of the encounters.
+
+        Parameters:
+            distances (array-like): The distance of each encountering body from its perturber.
+
+            speeds (array-like): The speed of each encountering body relative to its perturber.
+
+            perturberMasses (array-like): The mass of each perturber.
+
+            G (float): The gravitational constant.
+
+            deltaT (int/float): The step being divided.
+
+            eta (float): The accuracy parameter; smaller values give more substeps.
+
+            maxSubsteps (int): The most substeps allowed.
+
+        Returns:
+            substeps (int): The number of substeps.
+
+    """
+    with np.errstate(divide = 'ignore'):
+        timescale = min(np.min(np.sqrt(distances**3 / (G * perturberMasses))), np.min(distances / speeds))
+
+    if not timescale > 0:
+        return(maxSubsteps)
+
+    return(int(np.clip(2**np.ceil(np.log2(max(deltaT / (eta * timescale), 1))), 1, maxSubsteps)))
+
+def subcycle(positions, velocities, calculate_accelerations, deltaT, substeps):
+    """
+
+    Moves a few bodies across deltaT with kick-drift-kick leapfrog substeps, in a field that changes with time.
+
+        Parameters:
+            positions (array-like): The (M, 3) array of starting positions.
+
+            velocities (array-like): The (M, 3) array of starting velocities.
+
+            calculate_accelerations (function): Returns the (M, 3) accelerations, taking (positions, fraction), where
+            fraction is how far through deltaT they are wanted.
+
+            deltaT (int/float): The time interval across which the bodies move.
+
+            substeps (int): The number of substeps.
+
+        Returns:
+            positions (array-like), velocities (array-like): The state at the end of deltaT.
+
+    """
+    positions = positions.copy()
+    velocities = velocities.copy()
+    h = deltaT / substeps
+
+    accelerations = calculate_accelerations(positions, 0.0)
+
+    for k in range(substeps):
+        velocities += 0.5 * h * accelerations
+        positions += h * velocities
+        accelerations = calculate_accelerations(positions, (k + 1) / substeps)
+        velocities += 0.5 * h * accelerations
+
+    return(positions, velocities)
+
+
+#The Dormand-Prince 5(4) coefficients: the stage times, the stage weights, and the 5th and 4th order solution weights.
+dormandPrinceC = [0, 1/5, 3/10, 4/5, 8/9, 1, 1]
+dormandPrinceA = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+dormandPrinceB5 = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+dormandPrinceB4 = np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+def dormand_prince_error(x0, v0, x1, v1, errorX, errorV, tolerance):
+    """
+
+    Scales the embedded error estimate of a step by the tolerance, per body, so that 1 is the largest acceptable error.
+
+        Parameters:
+            x0, v0 (array-like): The positions and velocities at the start of the step.
+
+            x1, v1 (array-like): The positions and velocities at the end of the step.
+
+            errorX, errorV (array-like): The estimated errors in the positions and velocities.
+
+            tolerance (float): The largest allowed error relative to the size of each body's position and velocity.
+
+        Returns:
+            error (float): The largest scaled error of any body.
+
+    """
+    scaleX = tolerance * np.maximum(np.linalg.norm(x0, axis = 1), np.linalg.norm(x1, axis = 1))
+    scaleV = tolerance * np.maximum(np.linalg.norm(v0, axis = 1), np.linalg.norm(v1, axis = 1))
+
+    #Stops bodies sitting exactly at the origin or at rest demanding zero error.
+    scaleX = np.maximum(scaleX, tolerance * scaleX.max() + 1e-300)
+    scaleV = np.maximum(scaleV, tolerance * scaleV.max() + 1e-300)
+
+    return(max(np.max(np.linalg.norm(errorX, axis = 1) / scaleX), np.max(np.linalg.norm(errorV, axis = 1) / scaleV)))
+
+def hermite_interpolate(x0, v0, a0, x1, v1, a1, h, s):
+    """
+
+    Interpolates the positions and velocities within a step with a quintic Hermite polynomial, which matches the
+    positions, velocities and accelerations at both ends, so the outputs are as accurate as the steps themselves. The
+    velocities are its derivative.
+
+        Parameters:
+            x0, v0, a0 (array-like): The positions, velocities and accelerations at the start of the step.
+
+            x1, v1, a1 (array-like): The positions, velocities and accelerations at the end of the step.
+
+            h (float): The length of the step.
+
+            s (float): The fraction of the step at which the state is wanted, between 0 and 1.
+
+        Returns:
+            positions (array-like), velocities (array-like): The interpolated state.
+
+    """
+    #The quintic Hermite basis functions, for the start and end positions, velocities and accelerations.
+    hx0 = 1 - 10*s**3 + 15*s**4 - 6*s**5
+    hv0 = s - 6*s**3 + 8*s**4 - 3*s**5
+    ha0 = (s**2 - 3*s**3 + 3*s**4 - s**5) / 2
+    hx1 = 10*s**3 - 15*s**4 + 6*s**5
+    hv1 = -4*s**3 + 7*s**4 - 3*s**5
+    ha1 = (s**3 - 2*s**4 + s**5) / 2
+
+    #Their derivatives with respect to s.
+    dx0 = -30*s**2 + 60*s**3 - 30*s**4
+    dv0 = 1 - 18*s**2 + 32*s**3 - 15*s**4
+    da0 = (2*s - 9*s**2 + 12*s**3 - 5*s**4) / 2
+    dx1 = -dx0
+    dv1 = -12*s**2 + 28*s**3 - 15*s**4
+    da1 = (3*s**2 - 8*s**3 + 5*s**4) / 2
+
+    positions = hx0*x0 + hv0*h*v0 + ha0*h**2*a0 + hx1*x1 + hv1*h*v1 + ha1*h**2*a1
+    velocities = (dx0*x0 + dx1*x1) / h + dv0*v0 + da0*h*a0 + dv1*v1 + da1*h*a1
+
+    return(positions, velocities)
+
+def integrate_adaptive(system, duration, outputInterval, callback, tolerance = 1e-10, minStep = 1.0, maxStep = 86400.0,
+    state = None, outputs = 0):
+    """
+
+    Advances the system with Dormand-Prince 5(4) steps whose length is chosen to keep the estimated error within the
+    tolerance, and calls back with the interpolated state at every output time.
+
+        Parameters:
+            system (System): Contains all Particle instances defined for the system.
+
+            duration (float): The total simulated time, in seconds.
+
+            outputInterval (float): The simulated time between outputs, in seconds.
+
+            callback (function): Called with the system at every output time, and at the end.
+
+            tolerance (float): The largest allowed error per step, relative to the size of each body's state.
+
+            minStep (float): The shortest step allowed; steps this short are accepted whatever their error.
+
+            maxStep (float): The longest step allowed.
+
+            state (dict): Kept up to date with the start of the step being tried: its 'time', length 'h', positions
+            'x0', velocities 'v0' and accelerations 'a0', and the 'accepted' and 'rejected' counts so far, so a
+            checkpoint saved by the callback can carry on from exactly that step. If it already holds them, the run
+            carries on from them rather than from the system.
+
+            outputs (int): The number of outputs already called back, when carrying on from a saved state.
+
+        Returns:
+            accepted (int): The number of accepted steps.
+
+            rejected (int): The number of rejected steps.
+
+    """
+    if state is None:
+        state = {}
+
+    #The output times, ending exactly at the duration.
+    outputTimes = list(np.arange(outputInterval, duration, outputInterval)) + [duration]
+    nextOutput = outputs
+
+    #Carries on from the start of the step a checkpoint was saved in, so the steps are the same as if never stopped.
+    if 'x0' in state:
+        time = float(state['time'])
+        h = float(state['h'])
+        accepted = int(state['accepted'])
+        rejected = int(state['rejected'])
+
+        x0 = np.array(state['x0'])
+        v0 = np.array(state['v0'])
+        a0 = np.array(state['a0'])
+
+        system.positions[:] = x0
+        system.velocities[:] = v0
+        system.moved()
+
+    else:
+        time = 0.0
+        h = min(maxStep, outputInterval, duration)
+        accepted = 0
+        rejected = 0
+
+        x0 = system.positions.copy()
+        v0 = system.velocities.copy()
+        a0 = system.current_accelerations().copy()
+
+    while time < duration:
+        h = min(h, duration - time)
+        state.update(time = time, h = h, x0 = x0, v0 = v0, a0 = a0, accepted = accepted, rejected = rejected)
+
+        #The slopes of the positions (k_x) and velocities (k_v) at each stage.
+        k_x = [v0]
+        k_v = [a0]
+
+        for stage in range(1, 6):
+            x = x0 + h * sum(weight * k for weight, k in zip(dormandPrinceA[stage], k_x))
+            v = v0 + h * sum(weight * k for weight, k in zip(dormandPrinceA[stage], k_v))
+            k_x.append(v)
+            k_v.append(system.calculate_accelerations(x))
+
+        x1 = x0 + h * sum(weight * k for weight, k in zip(dormandPrinceB5, k_x))
+        v1 = v0 + h * sum(weight * k for weight, k in zip(dormandPrinceB5, k_v))
+
+        #The last stage is at the end of the step, so it is calculated through the system's cache.
+        system.positions[:] = x1
+        system.velocities[:] = v1
+        system.moved()
+        a1 = system.current_accelerations().copy()
+        k_x.append(v1)
+        k_v.append(a1)
+
+        errorWeights = dormandPrinceB5 - dormandPrinceB4
+        errorX = h * sum(weight * k for weight, k in zip(errorWeights, k_x))
+        errorV = h * sum(weight * k for weight, k in zip(errorWeights, k_v))
+        error = dormand_prince_error(x0, v0, x1, v1, errorX, errorV, tolerance)
+
+        if error <= 1 or h <= minStep:
+            accepted += 1
+            system.accelerations[:] = a1
+
+            #Outputs every requested time within the step.
+            while nextOutput < len(outputTimes) and outputTimes[nextOutput] <= time + h * (1 + 1e-12):
+                s = (outputTimes[nextOutput] - time) / h
+                positions, velocities = hermite_interpolate(x0, v0, a0, x1, v1, a1, h, min(s, 1.0))
+
+                system.positions[:] = positions
+                system.velocities[:] = velocities
+                system.moved()
+                callback(system)
+
+                nextOutput += 1
+
+            system.positions[:] = x1
+            system.velocities[:] = v1
+            system.moved()
+
+            time += h
+            x0, v0, a0 = x1, v1, a1
+
+        else:
+            rejected += 1
+            system.positions[:] = x0
+            system.velocities[:] = v0
+            system.moved()
+
+        #Picks the next step from the error, limiting how quickly it can change.
+        factor = 5.0 if error == 0 else min(5.0, max(0.2, 0.9 * error**(-1/5)))
+        h = min(maxStep, max(minStep, h * factor))
+
+    system.accelerations[:] = a0
+
+    return(accepted, rejected)
@@ -2,119 +2,333 @@
 
 This is the main code for the simulation.
 
-After calling Menu and data, it creates the required Particle instances and updates them as long as the initial conditions
-require. It also stores the initial conditions, ephemeride and conservation data in text files which can be saved for later.
+After reading the run parameters from a config file, the command line or the Menu, it creates the required Particle
+instances and updates them as long as the initial conditions require. It also stores the initial conditions, ephemeride
+and conservation data in text files which can be saved for later.
+
+Running it with no arguments opens the Menu, as before. For batch jobs without a display, give it a config file and/or
+--set options instead, i.e.
+
+    python Main.py run.json --set deltaT=3600 --set plot=false
+
+tkinter is only imported when the Menu is used.
+
+Long runs can save a checkpoint every so often (checkpointEvery, in simulated seconds), and --resume carries on from
+the last one after a crash or a wall-clock limit, appending to the same output files.
+
+--set profile=true times each phase of the step loop and adds them to the summary file, see Profiler.
 
 """
 
 import data
 import Graphics
+import Profiler
 from Particle import Particle
+from System import System
+from Integrators import get_integrator, integrate_adaptive
 from Files import *
-from Menu import MainWindow as menu
+import Config
+import argparse
+import json
+import os
 import numpy as np
 import Tests
 
     
 
-def update(system, deltaT, algorithm):
+def update(system, deltaT, algorithm, writer, accumulator):
     """
 
     Updates the position, velocity and acceleration of each body.
 
         Parameters:
-            system (list-like): Contains all Particle instances defined for the system.
+            system (System): Contains all Particle instances defined for the system.
 
             deltaT (int/float): The time interval across which the particle moves.
 
-            algorithm (int): A numerical representation of which approximation algorithm is used.
+            algorithm (int): A numerical representation of which approximation algorithm is used, see Integrators.registry.
+
+            writer (TrajectoryWriter): Buffers the ephemeride and conservation data and writes it in chunks.
+
+            accumulator (ConservationAccumulator): Keeps running statistics of the conserved quantities.
 
     """
-        
-    for body in system:
-        #Updates all accelerations before velocity and position.
-        body.update_gravitational_acceleration(system)
 
-    for body in system:
-        #Updates position and velocity.
-        body.algorithm_choice(deltaT, system, algorithm)
+    #Updates every position and velocity at once, calculating the accelerations the algorithm needs.
+    with system.profiler.phase('integration'):
+        system.step(deltaT, algorithm)
 
-        #Updates ephemeride files.
-        ephemeride_file(body)
+    record(system, writer, accumulator)
 
-    
-    #Saves the current energy, linear momentum and angular momentum.
-    energy_file(system)
-    LM_file(system)
-    AM_file(system)
 
+def record(system, writer, accumulator):
+    """
 
-#Initialises the menu
-Menu = menu()
+    Updates the conservation statistics, then saves the current positions, energy, linear momentum and angular momentum.
 
-#Takes the time interval, formats the start date and end date.
-deltaT = int(Menu.outputs[0])
+    Both are only done on output steps, every stride steps, as with the Barnes-Hut solver the potential energy takes a
+    walk of the tree, which would otherwise cost as much as the step itself.
 
+        Parameters:
+            system (System): Contains all Particle instances defined for the system.
 
-#Converts the start and end dates into astropy-compatible formats.
-startDate = data.date_convert(
-    day = Menu.outputs[1], 
-    month = Menu.outputs[2],
-    year = Menu.outputs[3]
-)
+            writer (TrajectoryWriter): Buffers the ephemeride and conservation data and writes it in chunks.
 
-endDate = data.date_convert(
-    day = Menu.outputs[4], 
-    month = Menu.outputs[5],
-    year = Menu.outputs[6]
-)
+            accumulator (ConservationAccumulator): Keeps running statistics of the conserved quantities.
 
-#The choice of algorithm
-algorithm = int(Menu.outputs[7])
+    """
+    diagnostics = None
+
+    if writer.due():
+        with system.profiler.phase('diagnostics'):
+            diagnostics = accumulator.update(system)
 
+    with system.profiler.phase('output'):
+        writer.record(system, diagnostics)
 
-#Finds the number of intervals needed based on the start date, end date and frame interval deltaT (must be int)
-intervalNumber = round(data.time_difference(startDate, endDate)/deltaT)
+    system.profiler.step()
 
-#Collects all the objects to be passed into the Acceleration function
-system = []
 
+def resume(system, checkpoint, header):
+    """
 
-#Iterates over all bodies with given data, creates a Particle instance for each one and adds it to the System list
-#Also creates the text file for each body
-for body in (data.jpl_scrape(dateString = startDate) + Menu.customBodies):
-    particle = Particle( 
-            name = body['Name'], 
-            mass = body['Mass'], 
-            radius = body['Radius'],
-            position = body['Position'],
-            velocity = body['Velocity'],
-            colour = body['Colour']
-            )
-    system.append(particle)
-    ephemeride_file(particle)
+    Puts the system back into the state saved in a checkpoint, after checking it was saved by the same run.
+
+        Parameters:
+            system (System): Contains all Particle instances defined for the system.
+
+            checkpoint (dict): The saved state, see Files.load_checkpoint.
+
+            header (dict): The run parameters of this run.
+
+    """
+    if checkpoint['names'] != system.names or checkpoint['header'] != json.loads(json.dumps(header)):
+        raise ValueError('The checkpoint was saved by a run with different bodies or parameters; '
+            'remove it or turn resume off to start again')
+
+    system.positions[:] = checkpoint['positions']
+    system.velocities[:] = checkpoint['velocities']
+    system.accelerations[:] = checkpoint['accelerations']
+    system.moved()
+
+
+def run(config):
+    """
+
+    Runs a whole simulation: builds the system, steps it to the end date while saving its state, then writes the tests
+    to the summary file and plots the result.
+
+        Parameters:
+            config (dict): Every run parameter, see Config.defaults and Config.make_config.
+
+        Returns:
+            system (System): The system at the end date.
+
+            accumulator (ConservationAccumulator): The running statistics of the conserved quantities.
+
+            errors (array-like): The distance of each JPL body from the JPL data through the run, see
+            Tests.trajectory_error, or None if 'trajectoryCheck' is off.
+
+    """
+    #Takes the time interval (must be int) and the output folder.
+    deltaT = config['deltaT']
+    directory = config['directory']
+
+    #Converts the start and end dates into astropy-compatible formats.
+    startDate = Config.date_string(config['startDate'])
+    endDate = Config.date_string(config['endDate'])
+
+    #The choice of algorithm, by number or name. 'adaptive' chooses its own step lengths, and deltaT becomes the output
+    #interval.
+    if config['algorithm'] == 'adaptive':
+        algorithm = 'adaptive'
+    else:
+        algorithm = get_integrator(config['algorithm']).number
+
+    #The number of steps between saved outputs, from the output interval in seconds
+    stride = output_stride(deltaT, float(config['outputEvery'] or 0))
+
+    #The number of steps, or adaptive outputs, between checkpoints, where 0 never saves one
+    if float(config['checkpointEvery'] or 0) > 0:
+        checkpointStride = output_stride(deltaT, float(config['checkpointEvery']))
+    else:
+        checkpointStride = 0
+
+    #Finds the number of intervals needed based on the start date, end date and frame interval deltaT
+    duration = data.time_difference(startDate, endDate)
+    intervalNumber = round(duration/deltaT)
+
+    #Collects all the objects before they are stored in the System
+    particles = []
+
+    #Iterates over all bodies with given data and creates a Particle instance for each one
+    for body in (data.jpl_scrape(dateString = startDate) + config['customBodies']):
+        particle = Particle( 
+                name = body['Name'], 
+                mass = body['Mass'], 
+                radius = body['Radius'],
+                position = body['Position'],
+                velocity = body['Velocity'],
+                colour = body['Colour'],
+                passive = body.get('Passive', False)
+                )
+        particles.append(particle)
+
+    #Stores every body in contiguous arrays, with each Particle viewing its own row
+    system = System(particles, solver = config['solver'], theta = float(config['theta']),
+        encounterFactor = float(config['encounterFactor']))
+
+    #The run parameters stored with the binary trajectory
+    header = {
+        'deltaT': deltaT,
+        'startDate': startDate,
+        'endDate': endDate,
+        'algorithm': algorithm,
+        'duration': duration if algorithm == 'adaptive' else intervalNumber * deltaT,
+        'stride': stride,
+        'solver': system.solver,
+        'theta': system.theta,
+        'encounterFactor': system.encounterFactor,
+        'customBodies': config['customBodies'],
+        'text': bool(config['text']),
+    }
+
+    #Starts the conservation statistics from the initial state
+    accumulator = Tests.ConservationAccumulator(system)
+
+    #Carries on from the last checkpoint if asked to and there is one, otherwise starts afresh
+    checkpoint = load_checkpoint(directory) if config['resume'] else None
+
+    if checkpoint is None:
+        #Sets up the file system with the setup file, position files for each body and the conservation quantities.
+        setup_files(deltaT, startDate, endDate, algorithm, system, directory = directory)
+        firstStep = 0
+
+    else:
+        resume(system, checkpoint, header)
+        accumulator.restore(checkpoint['accumulator'])
+        firstStep = checkpoint['step']
+        print('Resuming from step ' + str(firstStep))
+
+    #Times each phase of the step loop if asked to; otherwise the system keeps the disabled profiler
+    if config['profile']:
+        traceFile = os.path.join(directory, 'profile_trace.jsonl') if config['profileTrace'] else None
+        system.profiler = Profiler.PhaseProfiler(traceFile = traceFile)
+
+    #Runs the simulation until the end date is reached
+    print('Running simulation')
+    with TrajectoryWriter(system, directory = directory, chunkSize = config['chunkSize'], text = config['text'], binary = True,
+        header = header, stride = stride, resume = None if checkpoint is None else checkpoint['writer']) as writer:
+        if algorithm == 'adaptive':
+            #Counts the outputs, which are deltaT apart, so the checkpoints know where to carry on from, and keeps the
+            #step the integrator is on, so a resumed run takes the same steps.
+            outputs = [firstStep]
+            state = {} if checkpoint is None else checkpoint['integrator']
+
+            def output(system):
+                record(system, writer, accumulator)
+                outputs[0] += 1
+
+                if checkpointStride and outputs[0] % checkpointStride == 0:
+                    with system.profiler.phase('checkpoint'):
+                        save_checkpoint(system, outputs[0], accumulator, writer, header, directory = directory,
+                            integratorState = state)
+
+            with system.profiler.phase('integration'):
+                accepted, rejected = integrate_adaptive(system, duration, deltaT, callback = output,
+                    tolerance = float(config['tolerance']), minStep = float(config['minStep']),
+                    maxStep = float(config['maxStep']), state = state, outputs = firstStep)
+        else:
+            for i in range(firstStep, intervalNumber):
+                update(system, deltaT, algorithm, writer, accumulator)
+
+                if checkpointStride and (i + 1) % checkpointStride == 0:
+                    with system.profiler.phase('checkpoint'):
+                        save_checkpoint(system, i + 1, accumulator, writer, header, directory = directory)
+    print('Simulation finished')
+
+    clear_checkpoint(directory)
+
+    #Applies the distance tests
+    Tests.distance_test(system, endDate, directory = directory)
+    errors = None
+    if config['trajectoryCheck']:
+        times, errors = Tests.trajectory_error(directory = directory)
+
+    #Compares the tree solver against direct summation
+    if system.solver != 'direct':
+        Tests.solver_test(system, directory = directory)
+
+    #Takes the three conservation tests from the statistics gathered during the run
+    dE, E, dL, L, dp, p = accumulator.summary()
+
+    #Adds to summary file
+    update_summary(dE, E, dL, L, dp, p, directory = directory)
+    update_drift_summary(accumulator, directory = directory)
+
+    if algorithm == 'adaptive':
+        update_step_summary(accepted, rejected, directory = directory)
+
+    if config['profile']:
+        system.profiler.close()
+        update_profile_summary(system.profiler, directory = directory)
+
+    #Saves the graph and animation without a display if asked to
+    if config['plotFile']:
+        Graphics.save_plot(directory, config['plotFile'], maxPoints = config['plotPoints'], method = config['plotMethod'])
+
+    if config['animationFile']:
+        Graphics.animate(directory, config['animationFile'], maxPoints = config['plotPoints'], method = config['plotMethod'])
+
+    #Plots graph from the binary trajectory, arranged by body rather than by time
+    if config['plot'] and not config['plotFile']:
+        header, positions = load_trajectory(directory)
+        Graphics.plot(system, positions.transpose(1, 0, 2), maxPoints = config['plotPoints'], method = config['plotMethod'])
+
+    return(system, accumulator, errors)
+
+
+def main(arguments = None):
+    """
+
+    Reads the run parameters from the command line, a config file or the Menu, then runs the simulation.
+
+        Parameters:
+            arguments (list-like): The command line arguments, sys.argv[1:] by default.
+
+    """
+    parser = argparse.ArgumentParser(description = 'Simulates the solar system from JPL data.')
+    parser.add_argument('config', nargs = '?', help = 'a JSON or YAML file of run parameters, see Config.defaults')
+    parser.add_argument('--set', action = 'append', default = [], metavar = 'KEY=VALUE',
+        help = 'sets one run parameter, i.e. --set deltaT=3600, taking precedence over the config file')
+    parser.add_argument('--gui', action = 'store_true', help = 'chooses the run parameters with the menu')
+    parser.add_argument('--resume', action = 'store_true', help = 'carries on from the last checkpoint, if any')
+    options = parser.parse_args(arguments)
 
-#Sets up the file system with the setup file, position files for each body and the conservation quantities.
-setup_files(deltaT, startDate, endDate, algorithm, system)
+    #Reads each --set option as a parameter name and value.
+    overrides = {}
+    for option in options.set:
+        key, separator, value = option.partition('=')
+        if not separator:
+            parser.error('--set options must be KEY=VALUE, not ' + repr(option))
+        overrides[key] = Config.parse_value(value)
 
-#Runs the simulation until the end date is reached
-print('Running simulation')
-for i in range(intervalNumber):
-    update(system, deltaT, algorithm)
-print('Simulation finished')
+    if options.resume:
+        overrides['resume'] = True
 
-#Applies the distance test
-Tests.distance_test(system, endDate)
+    #With nothing else to go on, the menu is opened as it always has been.
+    if options.gui or (options.config is None and not overrides):
+        from Menu import MainWindow as menu
+        config = Config.make_config(Config.from_menu(menu()), **overrides)
 
-#Applies the three conservation tests
-dE, E = Tests.cons_of_energy()
+    elif options.config is not None:
+        config = Config.load_config(options.config, **overrides)
 
-dL, L = Tests.cons_of_AM()
+    else:
+        config = Config.make_config(**overrides)
 
-dp, p = Tests.cons_of_LM()
+    run(config)
 
-#Adds to summary file
-update_summary(dE, E, dL, L, dp, p)
 
-#Plots graph
-Graphics.plot(system, scrape_position_data(system))
+if __name__ == '__main__':
+    main()
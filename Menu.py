@@ -30,6 +30,12 @@ class MainWindow:
 
             algorithm(): Creates the algorithm input frame.
 
+            solver(): Creates the force solver input frame.
+
+            output(): Creates the output interval input frame.
+
+            adaptive(): Creates the adaptive algorithm input frame.
+
             enter_button(): Creates the 'Continue' button to move onto the simulation itself.
 
             new_body_button(): Creates the 'Add new body' button to allow the user to add custom Particle instances.
@@ -65,6 +71,9 @@ class MainWindow:
         self.time_period()
         self.dates()
         self.algorithm()
+        self.solver()
+        self.output()
+        self.adaptive()
         self.enter_button()
         self.new_body_button()
 
@@ -140,7 +149,8 @@ class MainWindow:
     def algorithm(self):
         """
 
-        Creates the algorithm section, allowing the user to select from the three available algorithms.
+        Creates the algorithm section, allowing the user to pick any algorithm in Integrators.registry by number or
+        name, or 'adaptive'. The force solver is picked separately, see solver().
 
         """
 
@@ -163,6 +173,89 @@ class MainWindow:
         frm_algorithm.grid(row = 3, column = 0, columnspan = 2)
 
 
+    def solver(self):
+        """
+
+        Creates the force solver section, allowing the user to pick direct summation or the Barnes-Hut tree and its
+        opening angle.
+
+        """
+
+        #Creates the frame for the solver section
+        frm_solver = tk.Frame(master = self.main)
+
+        #Creates the label for the solver input
+        lbl_solver = tk.Label(master = frm_solver, text = 'Solver, opening angle', 
+                                width = 18, anchor = 'w')
+        lbl_solver.grid(row = 0, column = 0)
+
+        #Creates the inputs for the solver and the opening angle
+        ent_solver = tk.Entry(master = frm_solver, width = 11)
+        ent_solver.insert(0, string = 'direct')
+        ent_solver.grid(row = 0, column = 1)
+        self.entries.append(ent_solver)
+
+        ent_theta = tk.Entry(master = frm_solver, width = 6)
+        ent_theta.insert(0, string = '0.5')
+        ent_theta.grid(row = 0, column = 2)
+        self.entries.append(ent_theta)
+
+        #Inserts the solver section frame
+        frm_solver.grid(row = 4, column = 0, columnspan = 2)
+
+
+    def output(self):
+        """
+
+        Creates the output interval section, setting how much simulated time passes between saved positions.
+
+        """
+
+        #Creates the frame for the output section
+        frm_output = tk.Frame(master = self.main)
+
+        #Creates the label for the output input
+        lbl_output = tk.Label(master = frm_output, text = 'Output every (s)', 
+                                width = 18, anchor = 'w')
+        lbl_output.grid(row = 0, column = 0)
+
+        #Creates the input for the output interval, where 0 saves every step
+        ent_output = tk.Entry(master = frm_output, width = 18)
+        ent_output.insert(0, string = '0')
+        ent_output.grid(row = 0, column = 1)
+        self.entries.append(ent_output)
+
+        #Inserts the output section frame
+        frm_output.grid(row = 5, column = 0, columnspan = 2)
+
+
+    def adaptive(self):
+        """
+
+        Creates the adaptive algorithm section, taking the tolerance and the shortest and longest steps. These are only
+        used when the algorithm is 'adaptive'.
+
+        """
+
+        #Creates the frame for the adaptive section
+        frm_adaptive = tk.Frame(master = self.main)
+
+        #Creates the label for the adaptive inputs
+        lbl_adaptive = tk.Label(master = frm_adaptive, text = 'Tol, min/max step (s)', 
+                                width = 18, anchor = 'w')
+        lbl_adaptive.grid(row = 0, column = 0)
+
+        #Creates the inputs for the tolerance, the shortest step and the longest step
+        for i, default in enumerate(['1e-10', '1', '86400']):
+            ent_adaptive = tk.Entry(master = frm_adaptive, width = 5)
+            ent_adaptive.insert(0, string = default)
+            ent_adaptive.grid(row = 0, column = i + 1)
+            self.entries.append(ent_adaptive)
+
+        #Inserts the adaptive section frame
+        frm_adaptive.grid(row = 6, column = 0, columnspan = 2)
+
+
     def enter_button(self):
         """
 
@@ -178,7 +271,7 @@ class MainWindow:
         btn_enter.grid(row = 0, column = 0)
 
         #Inserts the button frame into the window.
-        frm_enter.grid(row = 4, column = 1, columnspan = 2, sticky = 'e')
+        frm_enter.grid(row = 7, column = 1, columnspan = 2, sticky = 'e')
 
 
     def new_body_button(self):
@@ -196,7 +289,7 @@ class MainWindow:
         btn_newBody.grid(row = 0, column = 0)
 
         #Inserts the button frame into the window
-        frm_newBody.grid(row = 4, column = 0, columnspan = 2, sticky = 'w')
+        frm_newBody.grid(row = 7, column = 0, columnspan = 2, sticky = 'w')
 
 
     def enter(self):
@@ -231,6 +324,8 @@ class SecondWindow:
 
     A second menu that takes in new bodies with custom mass, position, velocity, radius, name and colour.
 
+    Passive bodies are massless test particles: they are pulled by the other bodies but do not pull on anything.
+
         Attributes:
             entries (list-like): Contains all tk.Entry instances.
 
@@ -272,6 +367,7 @@ class SecondWindow:
                 'Position vector (m)',
                 'Velocity vector (m/s)',
                 'Colour (hex)',
+                'Passive (y/n)',
             ]
 
         self.defaultList = [
@@ -281,6 +377,7 @@ class SecondWindow:
             ['0','0','0'],
             ['0','0','0'],
             '#ffffff',
+            'n',
         ]
 
         self.MainWindow = MainWindow
@@ -413,7 +510,8 @@ class SecondWindow:
                 'Radius': float(self.entries[2].get()),
                 'Position': [float(self.entries[3].get()), float(self.entries[4].get()), float(self.entries[5].get())],
                 'Velocity': [float(self.entries[6].get()), float(self.entries[7].get()), float(self.entries[8].get())],
-                'Colour': self.entries[9].get()
+                'Colour': self.entries[9].get(),
+                'Passive': self.entries[10].get().lower() in ['y', 'yes']
             },
         )        
 
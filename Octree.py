@@ -0,0 +1,261 @@
+"""
+
+Contains the Octree class, used to approximate gravitational accelerations with the Barnes-Hut method.
+
+The tree is built and walked level by level with array operations, so the cost scales as O(N log N) rather than O(N^2).
+
+"""
+
+import numpy as np
+
+#The direction of each octant's centre from its parent's centre, indexed by octant number.
+octantOffsets = np.array([[(i & 1) * 2 - 1, (i >> 1 & 1) * 2 - 1, (i >> 2 & 1) * 2 - 1] for i in range(8)], dtype = float)
+
+
+class Octree:
+    """
+
+    An octree of the bodies in a system, storing the mass and centre of mass of every node.
+
+        Attributes:
+            positions (array-like): The (N, 3) array of positions the tree was built from.
+
+            masses (array-like): The (N,) array of masses.
+
+            order (array-like): The body indices sorted so that the bodies of every node are contiguous.
+
+            starts (array-like): The index into order of the first body in each node.
+
+            counts (array-like): The number of bodies in each node.
+
+            centres (array-like): The geometric centre of each node's cube.
+
+            halfSizes (array-like): Half the side length of each node's cube.
+
+            children (array-like): The (M, 8) array of child node indices, -1 where a child is empty.
+
+            nodeMasses (array-like): The total mass in each node.
+
+            centresOfMass (array-like): The centre of mass of each node.
+
+        Methods:
+            accelerations(G, theta, chunkSize): Approximates the acceleration of every body due to all the others.
+
+            potentials(G, theta, chunkSize): Approximates the gravitational potential at every body due to all the others.
+
+    """
+
+    def __init__(self, positions, masses, leafSize = 1, maxDepth = 32):
+        """
+
+        Builds a new Octree instance.
+
+            Parameters:
+                positions (array-like): The (N, 3) array of body positions.
+
+                masses (array-like): The (N,) array of body masses.
+
+                leafSize (int): The largest number of bodies a node may hold without being split.
+
+                maxDepth (int): The deepest level of the tree, which stops coincident bodies being split forever.
+
+        """
+        self.positions = np.asarray(positions, dtype = float)
+        self.masses = np.asarray(masses, dtype = float)
+
+        bodyNumber = len(self.positions)
+
+        #The root cube encloses every body.
+        lower = self.positions.min(axis = 0)
+        upper = self.positions.max(axis = 0)
+        rootHalfSize = 0.5 * (upper - lower).max() * (1 + 1e-9)
+        if rootHalfSize == 0:
+            rootHalfSize = 1.0
+
+        self.order = np.arange(bodyNumber)
+        starts = np.array([0])
+        counts = np.array([bodyNumber])
+        centres = np.array([0.5 * (lower + upper)])
+        halfSizes = np.array([rootHalfSize])
+        parents = np.array([-1])
+        depths = np.array([0])
+        children = np.full((1, 8), -1)
+
+        #The node each slot of order currently belongs to.
+        nodeOf = np.zeros(bodyNumber, dtype = int)
+
+        #Splits every overfull node one level at a time.
+        for depth in range(maxDepth):
+            isActive = (counts > leafSize) & (depths == depth)
+            if not isActive.any():
+                break
+
+            slots = np.nonzero(isActive[nodeOf])[0]
+            slotNodes = nodeOf[slots]
+            slotPositions = self.positions[self.order[slots]]
+            slotCentres = centres[slotNodes]
+
+            #Finds the octant of every body within its node.
+            octants = ((slotPositions[:, 0] > slotCentres[:, 0]) * 1 +
+                (slotPositions[:, 1] > slotCentres[:, 1]) * 2 +
+                (slotPositions[:, 2] > slotCentres[:, 2]) * 4)
+
+            #Sorts the bodies by octant without moving them out of their node.
+            keys = starts[slotNodes] * 8 + octants
+            sort = np.argsort(keys, kind = 'stable')
+            self.order[slots] = self.order[slots][sort]
+            keys = keys[sort]
+
+            #Every run of equal keys becomes a child node.
+            isFirst = np.r_[True, keys[1:] != keys[:-1]]
+            firstSlots = np.nonzero(isFirst)[0]
+            childCounts = np.diff(np.r_[firstSlots, len(slots)])
+            childParents = slotNodes[firstSlots]
+            childOctants = keys[firstSlots] % 8
+            childIds = len(starts) + np.arange(len(firstSlots))
+
+            starts = np.r_[starts, slots[firstSlots]]
+            counts = np.r_[counts, childCounts]
+            halfSizes = np.r_[halfSizes, 0.5 * halfSizes[childParents]]
+            centres = np.r_[centres, centres[childParents] + octantOffsets[childOctants] * halfSizes[childIds][:, np.newaxis]]
+            parents = np.r_[parents, childParents]
+            depths = np.r_[depths, np.full(len(childIds), depth + 1)]
+            children = np.r_[children, np.full((len(childIds), 8), -1)]
+            children[childParents, childOctants] = childIds
+
+            nodeOf[slots] = np.repeat(childIds, childCounts)
+
+        self.starts = starts
+        self.counts = counts
+        self.centres = centres
+        self.halfSizes = halfSizes
+        self.children = children
+        self.isLeaf = (children < 0).all(axis = 1)
+
+        #Sums the mass and mass moment of the leaves, then passes them up the tree from the deepest level.
+        orderedMasses = self.masses[self.order]
+        self.nodeMasses = np.bincount(nodeOf, weights = orderedMasses, minlength = len(starts))
+        moments = np.stack([np.bincount(nodeOf, weights = orderedMasses * self.positions[self.order, k], minlength = len(starts))
+            for k in range(3)], axis = 1)
+
+        for depth in range(depths.max(), 0, -1):
+            nodes = np.nonzero(depths == depth)[0]
+            np.add.at(self.nodeMasses, parents[nodes], self.nodeMasses[nodes])
+            np.add.at(moments, parents[nodes], moments[nodes])
+
+        #Massless nodes take their geometric centre as their centre of mass.
+        self.centresOfMass = centres.copy()
+        hasMass = self.nodeMasses > 0
+        self.centresOfMass[hasMass] = moments[hasMass] / self.nodeMasses[hasMass][:, np.newaxis]
+
+    def accelerations(self, G, theta = 0.5, chunkSize = 4096):
+        """
+
+        Approximates the acceleration of every body by walking the tree, treating any node that appears smaller than
+        the opening angle as a single mass at its centre of mass.
+
+            Parameters:
+                G (float): The gravitational constant.
+
+                theta (float): The opening angle; 0 reproduces direct summation, larger values are faster and less accurate.
+
+                chunkSize (int): The number of bodies walked through the tree at once, which bounds the memory used.
+
+            Returns:
+                accelerations (array-like): The (N, 3) array of body accelerations.
+
+        """
+        return(self._walk(G, theta, chunkSize, np.zeros((len(self.positions), 3))))
+
+    def potentials(self, G, theta = 0.5, chunkSize = 4096):
+        """
+
+        Approximates the size of the gravitational potential, G*m/r summed over the other bodies, at every body by the
+        same walk as accelerations, using the monopole of every accepted node. The potential energy of the bodies is
+        half the sum of their masses times these potentials.
+
+            Parameters:
+                G (float): The gravitational constant.
+
+                theta (float): The opening angle, see accelerations.
+
+                chunkSize (int): The number of bodies walked through the tree at once.
+
+            Returns:
+                potentials (array-like): The (N,) array of potentials.
+
+        """
+        return(self._walk(G, theta, chunkSize, np.zeros(len(self.positions))))
+
+    def _walk(self, G, theta, chunkSize, totals):
+        """
+
+        Walks every body through the tree, adding the accelerations, if totals is (N, 3), or the potentials, if totals
+        is (N,), of the accepted nodes and leaf bodies onto totals.
+
+        """
+        bodyNumber = len(self.positions)
+
+        #Walks spatially neighbouring bodies together, as they open similar nodes.
+        for first in range(0, bodyNumber, chunkSize):
+            targets = self.order[first:first + chunkSize]
+
+            #Every (body, node) pair still to be considered, starting from the root.
+            pairTargets = targets
+            pairNodes = np.zeros(len(targets), dtype = int)
+
+            while len(pairTargets):
+                targetPositions = self.positions[pairTargets]
+                isLeaf = self.isLeaf[pairNodes]
+
+                #Nodes are accepted if they appear small enough and do not contain the body itself.
+                displacements = self.centresOfMass[pairNodes] - targetPositions
+                distances = np.sqrt(np.einsum('ij,ij->i', displacements, displacements))
+                contains = (np.abs(targetPositions - self.centres[pairNodes]) <= self.halfSizes[pairNodes][:, np.newaxis]).all(axis = 1)
+                accept = ~isLeaf & ~contains & (2 * self.halfSizes[pairNodes] < theta * distances)
+
+                self._accumulate(totals, pairTargets[accept], displacements[accept], distances[accept],
+                    self.nodeMasses[pairNodes[accept]], G)
+
+                #Leaves are summed directly over the bodies they hold.
+                leafTargets = pairTargets[isLeaf]
+                leafNodes = pairNodes[isLeaf]
+                leafCounts = self.counts[leafNodes]
+                pairIndex = np.repeat(np.arange(len(leafNodes)), leafCounts)
+                offsets = np.arange(len(pairIndex)) - np.repeat(np.cumsum(leafCounts) - leafCounts, leafCounts)
+                sources = self.order[self.starts[leafNodes][pairIndex] + offsets]
+                leafTargets = leafTargets[pairIndex]
+
+                isOther = sources != leafTargets
+                sources = sources[isOther]
+                leafTargets = leafTargets[isOther]
+                leafDisplacements = self.positions[sources] - self.positions[leafTargets]
+                leafDistances = np.sqrt(np.einsum('ij,ij->i', leafDisplacements, leafDisplacements))
+                self._accumulate(totals, leafTargets, leafDisplacements, leafDistances, self.masses[sources], G)
+
+                #Every other node is opened into its children.
+                isOpened = ~isLeaf & ~accept
+                openedChildren = self.children[pairNodes[isOpened]]
+                exists = openedChildren >= 0
+                pairTargets = np.repeat(pairTargets[isOpened], exists.sum(axis = 1))
+                pairNodes = openedChildren[exists]
+
+        return(totals)
+
+    def _accumulate(self, totals, targets, displacements, distances, masses, G):
+        """
+
+        Adds the acceleration, or the potential if totals is one-dimensional, due to each (body, source) pair onto the
+        body.
+
+        """
+        if len(targets) == 0:
+            return
+
+        if totals.ndim == 1:
+            totals += np.bincount(targets, weights = G * masses / distances, minlength = len(totals))
+            return
+
+        weights = G * masses / distances**3
+        for k in range(3):
+            totals[:, k] += np.bincount(targets, weights = weights * displacements[:, k], minlength = len(totals))
@@ -26,9 +26,13 @@ class Particle:
 
             colour (str): The colour of the body as a hexadecimal code.
 
+            passive (bool): Whether the body is a massless test particle, which feels gravity but exerts none.
+
             G (float): The gravitational constant.
 
         Methods:
+            bind(position, velocity, acceleration, system): Stores the 3-vectors in the given arrays, i.e. rows of a System.
+
             algorithm_choice(deltaT, system, algorithm): Activates one of the approximation algorithms based on the user choice.
 
             euler(deltaT): Updates the position and velocity using the Euler method.
@@ -59,6 +63,7 @@ class Particle:
         velocity = np.array([0, 0, 0], dtype=float),
         acceleration = np.array([0, 0, 0], dtype=float),
         colour =  'ffffff',
+        passive = False,
     ):
 
         """
@@ -70,10 +75,12 @@ class Particle:
         self.name = name
         self.mass = mass
         self.radius = radius
-        self.position = np.array(position.copy(), dtype = float)
-        self.velocity = np.array(velocity.copy(), dtype = float)
-        self.acceleration = np.array(acceleration.copy(), dtype = float)
+        self._position = np.array(position.copy(), dtype = float)
+        self._velocity = np.array(velocity.copy(), dtype = float)
+        self._acceleration = np.array(acceleration.copy(), dtype = float)
         self.colour = colour
+        self.passive = passive
+        self.system = None
         self.G = 6.67408E-11
 
     def __str__(self):
@@ -81,6 +88,54 @@ class Particle:
             self.name, self.mass,self.position, self.velocity, self.acceleration
             )
 
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        #Writes into the existing array so views held by a System stay valid.
+        self._position[...] = value
+
+        if self.system is not None:
+            self.system.moved()
+
+    @property
+    def velocity(self):
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value):
+        self._velocity[...] = value
+
+    @property
+    def acceleration(self):
+        return self._acceleration
+
+    @acceleration.setter
+    def acceleration(self, value):
+        self._acceleration[...] = value
+
+    def bind(self, position, velocity, acceleration, system = None):
+        """
+
+        Replaces the stored position, velocity and acceleration with the given arrays, i.e. rows of a System's arrays.
+
+            Parameters:
+                position (array-like): The array the position is stored in from now on.
+
+                velocity (array-like): The array the velocity is stored in from now on.
+
+                acceleration (array-like): The array the acceleration is stored in from now on.
+
+                system (System): The system that owns the arrays, which is told whenever the position is set.
+
+        """
+        self._position = position
+        self._velocity = velocity
+        self._acceleration = acceleration
+        self.system = system
+
     def algorithm_choice(self, deltaT, system, algorithm):
         """
 
@@ -150,8 +205,8 @@ class Particle:
 
         #Loops across all bodies in the system
         for body in system:
-            #Removes the mass currently being considered from the total acceleration
-            if body.name == self.name:
+            #Removes the mass currently being considered and any passive bodies from the total acceleration
+            if body.name == self.name or body.passive:
                 pass
 
             else:
@@ -182,8 +237,8 @@ class Particle:
 
         #Loops across all bodies in the system
         for body in system:
-            #Removes the mass currently being considered from the total acceleration
-            if body.name == self.name:
+            #Removes the mass currently being considered and any passive bodies from the total acceleration
+            if body.name == self.name or body.passive:
                 pass
 
             else:
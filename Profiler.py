@@ -0,0 +1,234 @@
+"""
+
+Contains the PhaseProfiler class, which times each phase of the step loop, i.e. force evaluation, integration,
+diagnostics and output, and counts things like force evaluations and bytes written.
+
+Profiling is opt-in. A disabled profiler hands out one shared context that does nothing, so the phases can be marked
+in the step loop at all times for the cost of a method call.
+
+Phases can be nested, i.e. force evaluations inside a step; each phase is only charged for the time not spent in the
+phases inside it, so the phase times add up to the time profiled.
+
+"""
+
+import json
+import time
+
+
+class _NoPhase:
+    """
+
+    The context handed out by a disabled profiler, which does nothing.
+
+    """
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, traceback):
+        return(False)
+
+
+class _Phase:
+    """
+
+    Times one pass through a phase for a PhaseProfiler, leaving out the time spent in any phases inside it.
+
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        #Starts counting the time of the phases inside this one.
+        self.profiler._stack.append(0.0)
+        self.start = time.perf_counter()
+
+        return(self)
+
+    def __exit__(self, excType, excValue, traceback):
+        elapsed = time.perf_counter() - self.start
+        inner = self.profiler._stack.pop()
+
+        if self.profiler._stack:
+            self.profiler._stack[-1] += elapsed
+
+        self.profiler.add(self.name, elapsed - inner)
+
+        return(False)
+
+_noPhase = _NoPhase()
+
+
+class PhaseProfiler:
+    """
+
+    Keeps the cumulative and per-step time spent in each phase of a run, and any counters.
+
+        Attributes:
+            enabled (bool): Whether anything is recorded.
+
+            totals (dict): The total time spent in each phase, in seconds.
+
+            calls (dict): The number of times each phase was entered.
+
+            counters (dict): The total of each counter, i.e. 'force evaluations'.
+
+            steps (int): The number of steps ended so far.
+
+            shortestStep (float): The shortest time between the ends of two steps, in seconds.
+
+            longestStep (float): The longest time between the ends of two steps, in seconds.
+
+            elapsed (float): The time from the start of profiling to the end of the last step, in seconds.
+
+            traceFile (str): The file each step's phase times and counters are written to as JSON lines, or None.
+
+        Methods:
+            phase(name): Returns a context that times the code inside it as part of the named phase.
+
+            count(name, amount): Adds to the named counter.
+
+            add(name, seconds): Adds time to the named phase.
+
+            step(): Ends a step, keeping its time and writing it to the trace file.
+
+            close(): Closes the trace file.
+
+    """
+
+    def __init__(self, enabled = True, traceFile = None):
+        """
+
+        Initialises a new PhaseProfiler instance, starting the clock.
+
+            Parameters:
+                enabled (bool): Whether anything is recorded.
+
+                traceFile (str): The file each step is written to as a line of JSON, or None for no trace.
+
+        """
+        self.enabled = enabled
+        self.totals = {}
+        self.calls = {}
+        self.counters = {}
+        self.steps = 0
+        self.shortestStep = float('inf')
+        self.longestStep = 0.0
+        self.elapsed = 0.0
+        self.traceFile = traceFile
+
+        #The times of the phases currently entered, innermost last.
+        self._stack = []
+
+        #The phase times and counters of the current step, only kept for the trace.
+        self._stepTotals = {}
+        self._stepCounters = {}
+
+        self._trace = open(traceFile, 'w') if enabled and traceFile is not None else None
+        self._start = time.perf_counter()
+        self._lastStep = self._start
+
+    def phase(self, name):
+        """
+
+        Returns a context that times the code inside it as part of the named phase, i.e.
+
+            with profiler.phase('force'):
+                ...
+
+            Parameters:
+                name (str): The name of the phase.
+
+            Returns:
+                context: The context to time the code with.
+
+        """
+        if not self.enabled:
+            return(_noPhase)
+
+        return(_Phase(self, name))
+
+    def add(self, name, seconds):
+        """
+
+        Adds time to the named phase.
+
+            Parameters:
+                name (str): The name of the phase.
+
+                seconds (float): The time spent in it.
+
+        """
+        if not self.enabled:
+            return
+
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+        if self._trace is not None:
+            self._stepTotals[name] = self._stepTotals.get(name, 0.0) + seconds
+
+    def count(self, name, amount = 1):
+        """
+
+        Adds to the named counter.
+
+            Parameters:
+                name (str): The name of the counter, i.e. 'bytes written'.
+
+                amount (int/float): The amount added.
+
+        """
+        if not self.enabled:
+            return
+
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+        if self._trace is not None:
+            self._stepCounters[name] = self._stepCounters.get(name, 0) + amount
+
+    def step(self):
+        """
+
+        Ends a step, keeping the time since the end of the last one, and writes the step's phase times and counters to
+        the trace file.
+
+        """
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        stepTime = now - self._lastStep
+        self._lastStep = now
+
+        self.steps += 1
+        self.elapsed = now - self._start
+        self.shortestStep = min(self.shortestStep, stepTime)
+        self.longestStep = max(self.longestStep, stepTime)
+
+        if self._trace is not None:
+            self._trace.write(json.dumps({'step': self.steps, 'seconds': stepTime, 'phases': self._stepTotals,
+                'counters': self._stepCounters}) + '\n')
+            self._stepTotals = {}
+            self._stepCounters = {}
+
+    def close(self):
+        """
+
+        Closes the trace file. Closing more than once does nothing.
+
+        """
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+#The profiler every System starts with, which records nothing.
+disabled = PhaseProfiler(enabled = False)
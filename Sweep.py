@@ -0,0 +1,268 @@
+"""
+
+Runs a grid of simulations in parallel, one worker process per case, replacing the one-at-a-time runs that made
+testing/full_runs.
+
+The grid is a JSON or YAML dictionary of run parameters, see Config.defaults, where any parameter given as a list is
+swept over. 'dates' can be given as a list of [start, end] pairs to sweep over date ranges, and 'customBodies' as a
+list of body lists. i.e.
+
+    {"deltaT": [10, 50, 100], "algorithm": ["euler_richardson", "leapfrog"], "plot": false}
+
+runs six cases. Every case is written to its own folder, named like those in testing/full_runs, and one row per case
+is written to sweep_summary.csv. Graphs given by 'plotFile' are saved by each case as it finishes, while animations
+given by 'animationFile' are rendered once every case has run, each with every core.
+
+"""
+
+import os
+import csv
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import Config
+import Graphics
+import data
+import Tests
+from Files import output_stride, stored_steps
+from Integrators import get_integrator
+
+def expand_grid(grid):
+    """
+
+    Turns a grid of run parameters into the list of every combination of them.
+
+        Parameters:
+            grid (dict): Run parameters, any of which can be a list of values to sweep over.
+
+        Returns:
+            cases (list-like): The run parameters of each case, as dictionaries.
+
+    """
+    grid = dict(grid)
+
+    #Custom bodies are already a list, so only a list of lists is swept over.
+    bodies = grid.get('customBodies', [])
+    if len(bodies) and all(isinstance(bodyList, list) for bodyList in bodies):
+        grid['customBodies'] = bodies
+    else:
+        grid['customBodies'] = [bodies]
+
+    #Date ranges are swept as pairs rather than every start with every end.
+    if 'dates' in grid:
+        grid['dates'] = [tuple(dates) for dates in grid['dates']]
+
+    keys = list(grid)
+    values = [grid[key] if isinstance(grid[key], list) else [grid[key]] for key in keys]
+
+    cases = []
+    for combination in itertools.product(*values):
+        case = dict(zip(keys, combination))
+
+        if 'dates' in case:
+            case['startDate'], case['endDate'] = case.pop('dates')
+
+        cases.append(case)
+
+    return(cases)
+
+def case_directories(configs, directory):
+    """
+
+    Names the output folder of each case after its algorithm and deltaT, i.e. euler_richardson_10, adding a number
+    when several cases would share a name.
+
+        Parameters:
+            configs (list-like): The run parameters of each case.
+
+            directory (str): The folder that holds every case's folder.
+
+        Returns:
+            directories (list-like): The output folder of each case.
+
+    """
+    names = []
+    for config in configs:
+        if config['algorithm'] == 'adaptive':
+            algorithm = 'adaptive'
+        else:
+            algorithm = get_integrator(config['algorithm']).name
+
+        names.append(algorithm + '_' + str(config['deltaT']))
+
+    directories = []
+    for count, name in enumerate(names):
+        if names.count(name) > 1:
+            name += '_' + str(names[:count].count(name))
+
+        directories.append(os.path.join(directory, name))
+
+    return(directories)
+
+def prefetch(configs):
+    """
+
+    Fetches the JPL states at every start and end date, and at every time the trajectory check will compare, into the
+    cache before the workers start, so each date is only fetched once and the workers all read it from disk.
+
+        Parameters:
+            configs (list-like): The run parameters of each case.
+
+    """
+    dates = set()
+    epochs = set()
+    for config in configs:
+        startDate = Config.date_string(config['startDate'])
+        dates.add(startDate)
+        dates.add(Config.date_string(config['endDate']))
+
+        if not config['trajectoryCheck']:
+            continue
+
+        #Predicts the times Tests.trajectory_error will pick from the number of states the run will store, as Main.run
+        #counts its steps or adaptive outputs.
+        deltaT = config['deltaT']
+        stride = output_stride(deltaT, float(config['outputEvery'] or 0))
+        duration = data.time_difference(startDate, Config.date_string(config['endDate']))
+
+        if config['algorithm'] == 'adaptive':
+            records = len(np.arange(deltaT, duration, deltaT)) + 1
+        else:
+            records = round(duration / deltaT)
+            duration = records * deltaT
+
+        chosen, times = Tests.trajectory_epochs(stored_steps(records, stride), stride, deltaT, duration)
+        epochs.update((startDate, float(seconds)) for seconds in times)
+
+    for dateString in sorted(dates):
+        data.jpl_scrape(dateString)
+
+    #Fetches the missing times from each start date together.
+    for startDate in sorted(set(date for date, seconds in epochs)):
+        data.cached_epochs(startDate, sorted(seconds for date, seconds in epochs if date == startDate))
+
+def run_case(config):
+    """
+
+    Runs one case in a worker process and summarises it.
+
+        Parameters:
+            config (dict): Every run parameter of the case.
+
+        Returns:
+            row (dict): The case's parameters, run time and results, or the error if it failed.
+
+    """
+    import Main
+
+    row = {
+        'directory': config['directory'],
+        'deltaT': config['deltaT'],
+        'algorithm': config['algorithm'],
+        'startDate': config['startDate'],
+        'endDate': config['endDate'],
+        'customBodies': len(config['customBodies']),
+    }
+
+    start = time.perf_counter()
+
+    try:
+        system, accumulator, errors = Main.run(config)
+
+    except Exception as error:
+        row['error'] = repr(error)
+        return(row)
+
+    row['seconds'] = time.perf_counter() - start
+    row['energyDrift'] = accumulator.energy.maxDrift / abs(accumulator.energy.initial)
+    row['angularMomentumDrift'] = (accumulator.angularMomentum.maxDrift /
+        np.linalg.norm(accumulator.angularMomentum.initial))
+
+    #The root mean square distance from JPL of each body through the run, if it was checked.
+    if errors is not None:
+        for count, name in enumerate(name for name in system.names if name in data.ephemerides):
+            row[name] = float(np.sqrt(np.mean(errors[:, count]**2)))
+
+    return(row)
+
+def write_summary(rows, fileName):
+    """
+
+    Writes one row per case to a CSV file, with a column for every value any case has.
+
+        Parameters:
+            rows (list-like): The summary of each case, from run_case.
+
+            fileName (str): The path of the CSV file.
+
+    """
+    columns = []
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+
+    f = open(fileName, 'w', newline = '')
+    writer = csv.DictWriter(f, fieldnames = columns)
+    writer.writeheader()
+    writer.writerows(rows)
+    f.close()
+
+def sweep(grid, directory = 'sweeps', workers = None):
+    """
+
+    Runs every case of a grid in parallel and writes the combined summary.
+
+        Parameters:
+            grid (dict): Run parameters, any of which can be a list of values to sweep over, see expand_grid.
+
+            directory (str): The folder that holds every case's folder and sweep_summary.csv.
+
+            workers (int): The number of worker processes, one per core by default.
+
+        Returns:
+            rows (list-like): The summary of each case, in the order of the grid.
+
+    """
+    #Plots would stop every worker, so they are off unless asked for.
+    grid = dict(grid)
+    grid.setdefault('plot', False)
+
+    configs = [Config.make_config(case) for case in expand_grid(grid)]
+    for config, caseDirectory in zip(configs, case_directories(configs, directory)):
+        config['directory'] = caseDirectory
+
+    #Animations render their frames in parallel themselves, so they wait until the cases are done.
+    animationFiles = [config['animationFile'] for config in configs]
+    for config in configs:
+        config['animationFile'] = None
+
+    os.makedirs(directory, exist_ok = True)
+    prefetch(configs)
+
+    print('Running ' + str(len(configs)) + ' cases')
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        rows = list(executor.map(run_case, configs))
+
+    write_summary(rows, os.path.join(directory, 'sweep_summary.csv'))
+
+    for config, row, animationFile in zip(configs, rows, animationFiles):
+        if animationFile and 'error' not in row:
+            print('Animating ' + config['directory'])
+            Graphics.animate(config['directory'], animationFile, maxPoints = config['plotPoints'],
+                method = config['plotMethod'], workers = workers)
+
+    return(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Runs a grid of simulations in parallel.')
+    parser.add_argument('grid', help = 'a JSON or YAML file of run parameters, where lists are swept over')
+    parser.add_argument('--directory', default = 'sweeps', help = 'the folder the cases and summary are written to')
+    parser.add_argument('--workers', type = int, default = None, help = 'the number of worker processes')
+    options = parser.parse_args()
+
+    rows = sweep(Config.read_file(options.grid), directory = options.directory, workers = options.workers)
+
+    failed = [row for row in rows if 'error' in row]
+    print(str(len(rows) - len(failed)) + ' cases finished, ' + str(len(failed)) + ' failed')
@@ -0,0 +1,580 @@
+"""
+
+Contains the System class, which stores every body in the simulation as contiguous arrays.
+
+The Particle instances in the system are kept as views into these arrays, so they remain usable by the rest of the code.
+
+"""
+
+import numpy as np
+import Profiler
+from Octree import Octree
+from Integrators import get_integrator, hermite_interpolate, encounter_substeps, subcycle
+
+#The force solvers that can be chosen for a System.
+solvers = ['direct', 'barnes-hut']
+
+def pairwise_accelerations(positions, masses, G, inverseDistances = False):
+    """
+
+    Calculates the gravitational acceleration of every body due to every other body in one broadcast operation.
+
+        Parameters:
+            positions (array-like): The (N, 3) array of body positions.
+
+            masses (array-like): The (N,) array of body masses.
+
+            G (float): The gravitational constant.
+
+            inverseDistances (bool): Whether the (N, N) matrix of inverse distances is returned as well.
+
+        Returns:
+            accelerations (array-like): The (N, 3) array of body accelerations.
+
+            inverseDistances (array-like): The (N, N) matrix of 1/r, with zeros on the diagonal, if requested.
+
+    """
+    #The vector displacement from body i to body j, stored at [i, j].
+    displacements = positions[np.newaxis, :, :] - positions[:, np.newaxis, :]
+
+    #The magnitude of each displacement.
+    distances = np.sqrt(np.einsum('ijk,ijk->ij', displacements, displacements))
+
+    #Removes each body from its own acceleration.
+    np.fill_diagonal(distances, np.inf)
+
+    #Weights each displacement by G*m_j/r^3 and sums over j.
+    inverse = 1 / distances
+    weights = masses[np.newaxis, :] * inverse**3
+    accelerations = G * np.einsum('ij,ijk->ik', weights, displacements)
+
+    if inverseDistances:
+        return(accelerations, inverse)
+
+    return(accelerations)
+
+def potential_energy(positions, masses, G, blockSize = 1024):
+    """
+
+    Calculates the gravitational potential energy of every distinct pair of bodies, one block of rows at a time so
+    the pairwise distances never need more than (blockSize, N) memory.
+
+        Parameters:
+            positions (array-like): The (N, 3) array of positions.
+
+            masses (array-like): The (N,) array of masses.
+
+            G (float): The gravitational constant.
+
+            blockSize (int): The number of rows of the distance matrix calculated at once.
+
+        Returns:
+            potentialEnergy (float): The gravitational potential energy of the system.
+
+    """
+    potentialEnergy = 0
+
+    for first in range(0, len(positions), blockSize):
+        rows = np.arange(first, min(first + blockSize, len(positions)))
+
+        displacements = positions[np.newaxis, :, :] - positions[rows, np.newaxis, :]
+        distances = np.sqrt(np.einsum('ijk,ijk->ij', displacements, displacements))
+
+        #Only counts each pair once, with j > i.
+        distances[np.arange(len(positions))[np.newaxis, :] <= rows[:, np.newaxis]] = np.inf
+
+        potentialEnergy += G * masses[rows] @ (1 / distances) @ masses
+
+    return(float(potentialEnergy))
+
+def field_accelerations(targetPositions, sourcePositions, sourceMasses, G):
+    """
+
+    Calculates the gravitational acceleration at each target position due to every source body.
+
+    A source at exactly the same position as a target is taken to be the target itself and is skipped.
+
+        Parameters:
+            targetPositions (array-like): The (M, 3) array of positions at which the acceleration is found.
+
+            sourcePositions (array-like): The (N, 3) array of source body positions.
+
+            sourceMasses (array-like): The (N,) array of source body masses.
+
+            G (float): The gravitational constant.
+
+        Returns:
+            accelerations (array-like): The (M, 3) array of accelerations.
+
+    """
+    #The vector displacement from target i to source j, stored at [i, j].
+    displacements = sourcePositions[np.newaxis, :, :] - targetPositions[:, np.newaxis, :]
+    distances = np.sqrt(np.einsum('ijk,ijk->ij', displacements, displacements))
+    distances[distances == 0] = np.inf
+
+    weights = sourceMasses[np.newaxis, :] / distances**3
+    return(G * np.einsum('ij,ijk->ik', weights, displacements))
+
+def field_timescales(targetPositions, targetVelocities, sourcePositions, sourceVelocities, sourceMasses, G,
+    significance = 0.01, sourceTimescales = False):
+    """
+
+    Calculates the shortest timescale on which the gravitational acceleration of each target changes, as the ratio of
+    acceleration to jerk of each of its interactions.
+
+    The ratio is taken pair by pair, so a weak but fast-changing pull, i.e. the Earth on the Moon, is not hidden by a
+    strong smooth one, i.e. the Sun on the Moon. Sources whose pull is less than the significance fraction of the
+    target's total are ignored.
+
+    A source at exactly the same position as a target is taken to be the target itself and is skipped.
+
+    The ratio is the same from either end of a pair, so the timescales the significant pairs impose on the sources can
+    also be returned; this keeps tightly bound pairs, i.e. the Earth and Moon, on the same timescale even when the
+    lighter body barely pulls the heavier one.
+
+        Parameters:
+            targetPositions (array-like): The (M, 3) array of target positions.
+
+            targetVelocities (array-like): The (M, 3) array of target velocities.
+
+            sourcePositions (array-like): The (N, 3) array of source body positions.
+
+            sourceVelocities (array-like): The (N, 3) array of source body velocities.
+
+            sourceMasses (array-like): The (N,) array of source body masses.
+
+            G (float): The gravitational constant.
+
+            significance (float): The smallest fraction of the total pull a source needs to be included.
+
+            sourceTimescales (bool): Whether to also return the shortest timescale of each source's significant pairs.
+
+        Returns:
+            timescales (array-like): The (M,) array of timescales, infinite where nothing changes.
+
+            sourceTimescales (array-like): The (N,) array of source timescales, only if requested.
+
+    """
+    #The relative position and velocity of source j from target i, stored at [i, j].
+    displacements = sourcePositions[np.newaxis, :, :] - targetPositions[:, np.newaxis, :]
+    relativeVelocities = sourceVelocities[np.newaxis, :, :] - targetVelocities[:, np.newaxis, :]
+
+    distances = np.sqrt(np.einsum('ijk,ijk->ij', displacements, displacements))
+    distances[distances == 0] = np.inf
+
+    #The size of each pull, |a| = G*m/r^2.
+    pulls = G * sourceMasses[np.newaxis, :] / distances**2
+
+    #|a|/|j| for one pair is r/|v - 3(r.v)r/r^2|, independent of the mass.
+    radialRates = np.einsum('ijk,ijk->ij', displacements, relativeVelocities) / distances**2
+    changes = relativeVelocities - 3 * radialRates[:, :, np.newaxis] * displacements
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        ratios = distances / np.sqrt(np.einsum('ijk,ijk->ij', changes, changes))
+
+    ratios[~(pulls >= significance * pulls.sum(axis = 1, keepdims = True))] = np.inf
+    ratios = np.nan_to_num(ratios, nan = np.inf)
+
+    if sourceTimescales:
+        return(ratios.min(axis = 1), ratios.min(axis = 0))
+
+    return(ratios.min(axis = 1))
+
+
+class System:
+    """
+
+    Models the whole set of bodies, storing their properties in (N, 3) arrays so they can be updated together.
+
+        Attributes:
+            particles (list-like): Contains all Particle instances defined for the system.
+
+            names (list-like): The name of each body.
+
+            masses (array-like): The (N,) array of masses.
+
+            positions (array-like): The (N, 3) array of positions.
+
+            velocities (array-like): The (N, 3) array of velocities.
+
+            accelerations (array-like): The (N, 3) array of accelerations.
+
+            passive (array-like): The (N,) boolean array marking massless test particles.
+
+            G (float): The gravitational constant.
+
+            solver (str): The force solver, either 'direct' or 'barnes-hut'.
+
+            theta (float): The Barnes-Hut opening angle.
+
+            stepIndex (int): Counts every change of the positions, and keys the cache of the pairwise results.
+
+            encounterFactor (float): The number of Hill radii inside which a small body is having a close encounter.
+
+            profiler (PhaseProfiler): Times the force evaluations and encounters, see Profiler; disabled by default.
+
+        Methods:
+            moved(): Marks the positions as changed, invalidating the cached pairwise results.
+
+            current_accelerations(): Returns the accelerations at the current positions, calculating them once per step.
+
+            potential_energy(): Calculates the gravitational potential energy, reusing the cached inverse distances.
+
+            calculate_accelerations(positions): Calculates the accelerations of the bodies at the given positions.
+
+            update_accelerations(): Updates the acceleration of every body.
+
+            accelerations_of(indices): Calculates the accelerations of only the chosen bodies.
+
+            timescales(): Calculates the acceleration to jerk ratio of every body.
+
+            close_encounters(): Finds the small bodies within a few Hill radii of a massive one.
+
+            step(deltaT, algorithm): Updates the positions and velocities using the chosen approximation algorithm.
+
+    """
+
+    def __init__(self, particles, solver = 'direct', theta = 0.5, encounterFactor = 3.0):
+        """
+
+        Initialises a new System instance, copying the state of each particle into the arrays.
+
+            Parameters:
+                particles (list-like): Contains the Particle instances to be stored in the system.
+
+                solver (str): The force solver, either 'direct' summation or the 'barnes-hut' tree.
+
+                theta (float): The Barnes-Hut opening angle, only used by the 'barnes-hut' solver.
+
+                encounterFactor (float): The number of Hill radii that counts as a close encounter; 0 turns the check
+                off.
+
+        """
+        if solver not in solvers:
+            raise ValueError('Solver must be one of: ' + ', '.join(solvers))
+
+        self.solver = solver
+        self.theta = theta
+        self.encounterFactor = encounterFactor
+        self.particles = list(particles)
+        self.names = [body.name for body in self.particles]
+        self.G = 6.67408E-11
+
+        #Copies the state of every particle into contiguous arrays.
+        self.masses = np.array([body.mass for body in self.particles], dtype = float)
+        self.positions = np.array([body.position for body in self.particles], dtype = float).reshape(-1, 3)
+        self.velocities = np.array([body.velocity for body in self.particles], dtype = float).reshape(-1, 3)
+        self.accelerations = np.array([body.acceleration for body in self.particles], dtype = float).reshape(-1, 3)
+
+        #Splits the bodies into sources of gravity and passive test particles.
+        self.passive = np.array([body.passive for body in self.particles], dtype = bool)
+        self._massive = np.nonzero(~self.passive)[0]
+        self._passive = np.nonzero(self.passive)[0]
+
+        #Points each particle at its own row of the arrays.
+        for i, body in enumerate(self.particles):
+            body.bind(self.positions[i], self.velocities[i], self.accelerations[i], self)
+
+        #The accelerations, and the inverse distances or octree, at the positions of step _cachedStep.
+        self.stepIndex = 0
+        self._cachedStep = None
+        self._cachedAccelerations = None
+        self._inverseDistances = None
+        self._cachedTree = None
+
+        #The octree built by the last Barnes-Hut force calculation, at whatever positions it was given.
+        self._lastTree = None
+
+        self.profiler = Profiler.disabled
+
+    def __len__(self):
+        return len(self.particles)
+
+    def __iter__(self):
+        return iter(self.particles)
+
+    def __getitem__(self, index):
+        return self.particles[index]
+
+    def __str__(self):
+        return "System: {0} bodies".format(len(self))
+
+    def calculate_accelerations(self, positions):
+        """
+
+        Calculates the acceleration of every body if they were at the given positions, using the chosen solver.
+
+        Passive bodies are left out of the sources, and are moved as one batch in the field of the massive bodies.
+
+            Parameters:
+                positions (array-like): The (N, 3) array of body positions.
+
+            Returns:
+                accelerations (array-like): The (N, 3) array of body accelerations.
+
+        """
+        with self.profiler.phase('force'):
+            self.profiler.count('force evaluations')
+
+            if len(self._passive) == 0:
+                return(self._massive_accelerations(positions, self.masses))
+
+            accelerations = np.empty_like(positions)
+
+            massivePositions = positions[self._massive]
+            massiveMasses = self.masses[self._massive]
+
+            accelerations[self._massive] = self._massive_accelerations(massivePositions, massiveMasses)
+            accelerations[self._passive] = field_accelerations(positions[self._passive], massivePositions, massiveMasses, self.G)
+
+            return(accelerations)
+
+    def accelerations_of(self, indices):
+        """
+
+        Calculates the accelerations of only the chosen bodies at the current positions, always by direct summation.
+
+            Parameters:
+                indices (array-like): The indices of the bodies whose accelerations are wanted.
+
+            Returns:
+                accelerations (array-like): The (M, 3) array of their accelerations.
+
+        """
+        with self.profiler.phase('force'):
+            self.profiler.count('partial force evaluations')
+
+            return(field_accelerations(self.positions[indices], self.positions[self._massive], self.masses[self._massive], self.G))
+
+    def timescales(self):
+        """
+
+        Calculates the timescale on which the acceleration of every body changes, due to the massive bodies.
+
+        Both bodies of a significant pair share its timescale, so a massive body is never slower than anything it
+        strongly pulls.
+
+            Returns:
+                timescales (array-like): The (N,) array of acceleration to jerk ratios, see field_timescales.
+
+        """
+        timescales, sourceTimescales = field_timescales(self.positions, self.velocities, self.positions[self._massive],
+            self.velocities[self._massive], self.masses[self._massive], self.G, sourceTimescales = True)
+        timescales[self._massive] = np.minimum(timescales[self._massive], sourceTimescales)
+
+        return(timescales)
+
+    def close_encounters(self, smallRatio = 1e-6, blockPairs = 2**20):
+        """
+
+        Finds the small bodies, i.e. satellites and passive bodies, that are within encounterFactor Hill radii of a
+        body at least 1/smallRatio times heavier. Hill radii are taken about the most massive body.
+
+        The small bodies are checked heaviest first, a block at a time, against only the perturbers heavy enough for
+        the lightest body in the block, so a belt of small massive bodies is never checked against itself and the
+        distances never need more than about blockPairs pairs of memory.
+
+            Parameters:
+                smallRatio (float): The largest mass ratio between a small body and its perturber.
+
+                blockPairs (int): The most (body, perturber) pairs whose distances are calculated at once.
+
+            Returns:
+                bodies (array-like): The indices of the encountering bodies.
+
+                perturbers (array-like): The index of the nearest perturber of each of those bodies.
+
+        """
+        if self.encounterFactor <= 0 or len(self._massive) < 2:
+            return(np.array([], dtype = int), np.array([], dtype = int))
+
+        masses = np.where(self.passive, 0.0, self.masses)
+        central = np.argmax(masses)
+
+        #The Hill radius of every massive body other than the central one.
+        perturbers = self._massive[self._massive != central]
+        hillRadii = (np.linalg.norm(self.positions[perturbers] - self.positions[central], axis = 1) *
+            (masses[perturbers] / (3 * masses[central]))**(1/3))
+
+        #Only bodies light enough to be small next to some perturber are checked, heaviest first.
+        candidates = np.nonzero(masses < smallRatio * masses[perturbers].max())[0]
+        candidates = candidates[candidates != central]
+        candidates = candidates[np.argsort(-masses[candidates], kind = 'stable')]
+
+        blockSize = max(1, blockPairs // len(perturbers))
+        bodies = []
+        nearest = []
+
+        for first in range(0, len(candidates), blockSize):
+            block = candidates[first:first + blockSize]
+
+            #The perturbers heavy enough to count for the lightest body in the block, which is the last.
+            heavy = smallRatio * masses[perturbers] > masses[block[-1]]
+            sources = perturbers[heavy]
+
+            displacements = self.positions[block][:, np.newaxis, :] - self.positions[sources][np.newaxis, :, :]
+            distances = np.sqrt(np.einsum('ijk,ijk->ij', displacements, displacements))
+
+            isClose = ((distances < self.encounterFactor * hillRadii[heavy][np.newaxis, :]) &
+                (masses[block][:, np.newaxis] < smallRatio * masses[sources][np.newaxis, :]))
+
+            #Each encountering body is matched with its nearest close perturber.
+            distances[~isClose] = np.inf
+            encountering = isClose.any(axis = 1)
+
+            bodies.append(block[encountering])
+            nearest.append(sources[np.argmin(distances[encountering], axis = 1)])
+
+        if not bodies:
+            return(np.array([], dtype = int), np.array([], dtype = int))
+
+        #Puts the bodies back in index order.
+        bodies = np.concatenate(bodies)
+        nearest = np.concatenate(nearest)
+        order = np.argsort(bodies)
+
+        return(bodies[order], nearest[order])
+
+    def _massive_accelerations(self, positions, masses):
+        """
+
+        Calculates the mutual accelerations of a set of gravitating bodies using the chosen solver.
+
+        """
+        if self.solver == 'barnes-hut':
+            self._lastTree = Octree(positions, masses)
+            return(self._lastTree.accelerations(self.G, self.theta))
+
+        return(pairwise_accelerations(positions, masses, self.G))
+
+    def moved(self):
+        """
+
+        Marks the positions as changed, so the cached pairwise results are recalculated when next needed.
+
+        """
+        self.stepIndex += 1
+
+    def current_accelerations(self):
+        """
+
+        Returns the accelerations at the current positions, only calculating them once per step.
+
+        With direct summation the inverse distances between the massive bodies are kept too, and with the Barnes-Hut
+        solver the octree, so the potential energy of the same positions needs no second pass over the pairs and no
+        second tree.
+
+            Returns:
+                accelerations (array-like): The (N, 3) array of body accelerations.
+
+        """
+        if self._cachedStep != self.stepIndex:
+            if self.solver == 'direct' and len(self._passive) == 0:
+                with self.profiler.phase('force'):
+                    self.profiler.count('force evaluations')
+                    self._cachedAccelerations, self._inverseDistances = pairwise_accelerations(
+                        self.positions, self.masses, self.G, inverseDistances = True)
+
+            elif self.solver == 'direct':
+                #Passive bodies are moved in the field of the massive ones, as in calculate_accelerations.
+                with self.profiler.phase('force'):
+                    self.profiler.count('force evaluations')
+                    massivePositions = self.positions[self._massive]
+                    massiveMasses = self.masses[self._massive]
+
+                    accelerations = np.empty_like(self.positions)
+                    accelerations[self._massive], self._inverseDistances = pairwise_accelerations(
+                        massivePositions, massiveMasses, self.G, inverseDistances = True)
+                    accelerations[self._passive] = field_accelerations(self.positions[self._passive], massivePositions,
+                        massiveMasses, self.G)
+
+                    self._cachedAccelerations = accelerations
+
+            else:
+                self._cachedAccelerations = self.calculate_accelerations(self.positions)
+                self._inverseDistances = None
+                self._cachedTree = self._lastTree
+
+            self._cachedStep = self.stepIndex
+
+        return(self._cachedAccelerations)
+
+    def update_accelerations(self):
+        """
+
+        Updates the acceleration of every body by superposing the accelerations due to all other bodies.
+
+        """
+        self.accelerations[:] = self.current_accelerations()
+
+    def potential_energy(self):
+        """
+
+        Calculates the gravitational potential energy of the massive bodies at the current positions; passive bodies
+        have no potential energy as they pull on nothing.
+
+        The force calculation for these positions is done here if needed, and is then reused by the next step. With
+        direct summation it also gives the inverse distances, and with the Barnes-Hut solver the potentials are found by
+        walking the same tree as the forces, so there is never a separate pass over every pair.
+
+            Returns:
+                potentialEnergy (float): The gravitational potential energy of the system.
+
+        """
+        self.current_accelerations()
+
+        masses = self.masses[self._massive]
+
+        #The tree solver takes the potentials from the tree built for the forces, rather than from every pair.
+        if self._inverseDistances is None:
+            return(float(0.5 * masses @ self._cachedTree.potentials(self.G, self.theta)))
+
+        #Each pair appears twice in the symmetric matrix.
+        return(float(0.5 * self.G * masses @ self._inverseDistances @ masses))
+
+    def step(self, deltaT, algorithm):
+        """
+
+        Updates the positions and velocities of every body using the chosen approximation algorithm.
+
+            Parameters:
+                deltaT (int/float): The time interval across which the system moves.
+
+                algorithm (int/str): The number or name of the approximation algorithm, see Integrators.registry.
+
+        """
+        bodies, perturbers = self.close_encounters()
+
+        if len(bodies) == 0:
+            get_integrator(algorithm).step(self, deltaT)
+            return
+
+        #The encountering bodies are redone afterwards, so only their starting state is kept.
+        startPositions = self.positions[bodies].copy()
+        startVelocities = self.velocities[bodies].copy()
+
+        distances = np.linalg.norm(startPositions - self.positions[perturbers], axis = 1)
+        speeds = np.linalg.norm(startVelocities - self.velocities[perturbers], axis = 1)
+        substeps = encounter_substeps(distances, speeds, self.masses[perturbers], self.G, deltaT)
+
+        sources = np.setdiff1d(self._massive, bodies)
+        sourcePositions = self.positions[sources].copy()
+        sourceVelocities = self.velocities[sources].copy()
+        sourceMasses = self.masses[sources]
+
+        get_integrator(algorithm).step(self, deltaT)
+
+        endPositions = self.positions[sources].copy()
+        endVelocities = self.velocities[sources].copy()
+
+        def calculate_accelerations(positions, fraction):
+            #The sources follow cubic paths between their start and end states; only the positions are needed.
+            interpolated = hermite_interpolate(sourcePositions, sourceVelocities, 0, endPositions, endVelocities, 0,
+                deltaT, fraction)[0]
+
+            return(field_accelerations(positions, interpolated, sourceMasses, self.G))
+
+        with self.profiler.phase('encounters'):
+            self.profiler.count('encounter substeps', int(substeps))
+            self.positions[bodies], self.velocities[bodies] = subcycle(startPositions, startVelocities,
+                calculate_accelerations, deltaT, substeps)
+        self.moved()
@@ -5,12 +5,82 @@ This contains functions that calculate several system parameters for conservatio
 """
 
 from Particle import Particle
+from System import field_accelerations, potential_energy
 import numpy as np
 
+def state_arrays(system):
+    """
+
+    Returns the masses, positions and velocities of the massive bodies in the system as arrays, taken straight from a
+    System or stacked from a list of Particle instances.
+
+    Passive bodies pull on nothing, so the energy and momenta the dynamics conserve are those of the massive bodies
+    alone, and passive bodies are left out of every total.
+
+        Parameters:
+            system (System/list-like): Contains all Particle instances defined for the system.
+
+        Returns:
+            masses (array-like): The (M,) array of masses.
+
+            positions (array-like): The (M, 3) array of positions.
+
+            velocities (array-like): The (M, 3) array of velocities.
+
+    """
+    if hasattr(system, 'positions'):
+        if len(system._passive) == 0:
+            return(system.masses, system.positions, system.velocities)
+
+        massive = system._massive
+        return(system.masses[massive], system.positions[massive], system.velocities[massive])
+
+    bodies = [body for body in system if not getattr(body, 'passive', False)]
+
+    masses = np.array([body.mass for body in bodies], dtype = float)
+    positions = np.array([body.position for body in bodies], dtype = float).reshape(-1, 3)
+    velocities = np.array([body.velocity for body in bodies], dtype = float).reshape(-1, 3)
+
+    return(masses, positions, velocities)
+
+def diagnostics(system):
+    """
+
+    Calculates the total kinetic energy, potential energy, linear momentum and angular momentum of the massive bodies
+    together from the system arrays.
+
+        Parameters:
+            system (System/list-like): Contains all Particle instances defined for the system.
+
+        Returns:
+            kineticEnergy (float): The total kinetic energy of the system.
+
+            potentialEnergy (float): The gravitational potential energy of the system.
+
+            linearMomentum (list-like): The total linear momentum of the system as a 3-vector.
+
+            angularMomentum (list-like): The total angular momentum of the system as a 3-vector.
+
+    """
+    masses, positions, velocities = state_arrays(system)
+
+    kineticEnergy = float(0.5 * masses @ np.einsum('ij,ij->i', velocities, velocities))
+
+    #A System can reuse the inverse distances from its force calculation.
+    if hasattr(system, 'potential_energy'):
+        potentialEnergy = system.potential_energy()
+
+    else:
+        potentialEnergy = potential_energy(positions, masses, system[0].G)
+    linearMomentum = masses @ velocities
+    angularMomentum = masses @ np.cross(positions, velocities)
+
+    return(kineticEnergy, potentialEnergy, linearMomentum, angularMomentum)
+
 def total_KE(system):
     """
 
-    Calculates the total kinetic energy of the system by summing the individual energies.
+    Calculates the total kinetic energy of the system from the mass and velocity arrays.
 
         Parameters: 
             system (list-like): An array containing each Particle object representing a solar system body.
@@ -19,15 +89,9 @@ def total_KE(system):
             kineticEnergy (int/float): The total kinetic energy of all bodies in the system.
 
     """
-    #Initialise the kinetic energy variable
-    kineticEnergy = 0
-
-    #Adds the individual energy of each body
-    for body in system:
-        kineticEnergy += body.calculate_kinetic_energy()
+    masses, positions, velocities = state_arrays(system)
 
-    #Returns the total kinetic energy
-    return kineticEnergy
+    return(float(0.5 * masses @ np.einsum('ij,ij->i', velocities, velocities)))
 
 def total_PE(system):
         """
@@ -41,21 +105,17 @@ def total_PE(system):
                 potentialEnergy (float): The gravitational potential energy of the system
         
         """
-        #Initialises the potential energy
-        potentialEnergy = 0
+        if hasattr(system, 'potential_energy'):
+            return(system.potential_energy())
 
-        #Iterates over all bodies without repeating a combination
-        for i, body in enumerate(system):
-            for j in range(i+1, len(system)):
-                potentialEnergy += ((system[i].G * system[i].mass * system[j].mass)/np.linalg.norm(system[i].position - system[j].position))
-        
-        #Returns the total potential energy
-        return potentialEnergy
+        masses, positions, velocities = state_arrays(system)
+
+        return(potential_energy(positions, masses, system[0].G))
 
 def total_AM(system):
     """
 
-    Calculates the total angular momentum of the system by summing the individual angular momenta.
+    Calculates the total angular momentum of the system from the position, velocity and mass arrays.
 
         Parameters: 
             system (list-like): An array containing each Particle object representing a solar system body.
@@ -64,20 +124,14 @@ def total_AM(system):
             angularMomentum (int/float): The total angular momentum of all bodies in the system.
 
     """
-    #Initialises the angular momentum variable
-    angularMomentum = 0
-
-    #Adds individual angular momenta
-    for body in system:
-        angularMomentum += body.calculate_angular_momentum()
+    masses, positions, velocities = state_arrays(system)
 
-    #Returns the angular momentum
-    return angularMomentum
+    return(masses @ np.cross(positions, velocities))
 
 def total_LM(system):
     """
 
-    Calculates the total linear momentum of the system by summing the individual linear momenta.
+    Calculates the total linear momentum of the system from the velocity and mass arrays.
 
         Parameters: 
             system (list-like): An array containing each Particle object representing a solar system body.
@@ -86,17 +140,11 @@ def total_LM(system):
             linearMomentum (int/float): The total linear momentum of all bodies in the system.
 
     """
-    #Initialises the linear momentum variable
-    linearMomentum = 0
+    masses, positions, velocities = state_arrays(system)
 
-    #Adds individual linear momenta
-    for body in system:
-        linearMomentum += body.calculate_linear_momentum()
+    return(masses @ velocities)
 
-    #Returns the linear momentum
-    return linearMomentum
-
-def distance_test(system, endDate):
+def distance_test(system, endDate, directory = 'ephemeride_data'):
     """
 
     Shows the distance between the 'ideal' data taken from JPL and the simulation data.
@@ -106,6 +154,8 @@ def distance_test(system, endDate):
 
         endDate (str): The end datetime, yyyy-mm-dd hh:mm:ss:ms
 
+        directory (str): The folder containing the summary file.
+
     """
     #Organises the JPL data at the end date in the same way as the simulation parameters.
     import data
@@ -132,23 +182,368 @@ def distance_test(system, endDate):
         text += (body.name + ': ' + str(distance) + ' metres out.\n')
 
     #Opens the text file in 'append' mode.
-    f = open('ephemeride_data/!summary_file.txt', 'a')
+    f = open(directory + '/!summary_file.txt', 'a')
 
     f.write(text)
     f.close()
 
-def cons_of_energy():
+def trajectory_error(directory = 'ephemeride_data', epochs = 100):
+    """
+
+    Shows the distance between the JPL data and the stored trajectory at many times through the run, rather than only
+    at the end. The JPL states at every chosen time come from the cache, see data.cached_epochs, and any not yet cached
+    are fetched together.
+
+        Parameters:
+            directory (str): The folder containing the binary trajectory store.
+
+            epochs (int): The most stored steps that are compared, spread evenly across the run.
+
+        Returns:
+            times (array-like): The (T,) array of times compared, in seconds after the start date.
+
+            errors (array-like): The (T, B) array of distances from the JPL positions, for the JPL bodies only.
+
+    """
+    import data
+    from Files import load_trajectory
+
+    header, positions = load_trajectory(directory)
+
+    #Stores written before the duration was kept end on their last output.
+    duration = header.get('duration', (len(positions) - 1) * header['stride'] * header['deltaT'])
+    chosen, times = trajectory_epochs(len(positions), header['stride'], header['deltaT'], duration, epochs)
+
+    #Custom bodies have no JPL data to compare with.
+    bodies = [name for name in header['names'] if name in data.ephemerides]
+    indices = [header['names'].index(name) for name in bodies]
+
+    ideal = data.cached_epochs(header['startDate'], times, bodies)
+    errors = np.linalg.norm(positions[chosen][:, indices] - ideal[:, :, :3], axis = 2)
+
+    #Adds a text variable that will be written to the summary file.
+    text = '\nDistance from JPL over ' + str(len(chosen)) + ' times:\n'
+
+    for count, name in enumerate(bodies):
+        worst = np.argmax(errors[:, count])
+        text += (name + ': ' + str(np.sqrt(np.mean(errors[:, count]**2))) + ' metres out on average, at most ' +
+            str(errors[worst, count]) + ' metres after ' + str(times[worst] / 86400) + ' days.\n')
+
+    f = open(directory + '/!summary_file.txt', 'a')
+    f.write(text)
+    f.close()
+
+    return(times, errors)
+
+def trajectory_epochs(stored, stride, deltaT, duration, epochs = 100):
+    """
+
+    Picks the stored steps that trajectory_error compares with JPL, spread evenly across the run, and their times, so
+    the same times can be fetched into the cache before a run.
+
+        Parameters:
+            stored (int): The number of states in the binary trajectory store, see Files.stored_steps.
+
+            stride (int): The number of steps between outputs.
+
+            deltaT (float): The time step, or the output interval of an adaptive run.
+
+            duration (float): The simulated time of the whole run, in seconds.
+
+            epochs (int): The most stored steps that are picked.
+
+        Returns:
+            chosen (array-like): The (T,) array of indices into the stored steps.
+
+            times (array-like): The (T,) array of their times, in seconds after the start date.
+
+    """
+    #Every stored step is stride steps after the last, apart from the final state, which is stored whatever.
+    times = np.arange(stored, dtype = float) * stride * deltaT
+    times[-1] = duration
+
+    chosen = np.unique(np.linspace(0, stored - 1, min(epochs, stored)).round().astype(int))
+
+    return(chosen, times[chosen])
+
+def solver_test(system, sampleSize = 100, directory = 'ephemeride_data'):
+    """
+
+    Shows the relative difference between the accelerations from the chosen force solver and direct summation.
+
+    Parameters:
+        system (System): Contains all Particle instances defined for the system.
+
+        sampleSize (int): The number of bodies compared, spread evenly through the system.
+
+        directory (str): The folder containing the summary file.
+
+    """
+    #Picks the bodies to compare, as direct summation for every body would defeat the point of a faster solver.
+    sample = np.unique(np.linspace(0, len(system) - 1, min(sampleSize, len(system))).round().astype(int))
+
+    #Finds the accelerations of the sample bodies both ways, with only the massive bodies as sources, as in the solver.
+    ideal = field_accelerations(system.positions[sample], system.positions[system._massive],
+        system.masses[system._massive], system.G)
+    approximate = system.calculate_accelerations(system.positions)[sample]
+
+    errors = np.linalg.norm(approximate - ideal, axis = 1) / np.linalg.norm(ideal, axis = 1)
+
+    #Adds a text variable that will be written to the summary file.
+    text = '\nForce solver: ' + system.solver + ', theta: ' + str(system.theta) + '\n'
+
+    for count, index in enumerate(sample):
+        text += (system.names[index] + ': ' + str(errors[count]) + ' relative acceleration error.\n')
+
+    text += ('Median relative acceleration error: ' + str(np.median(errors)) + '\n' +
+        'Maximum relative acceleration error: ' + str(np.max(errors)) + '\n')
+
+    #Opens the text file in 'append' mode.
+    f = open(directory + '/!summary_file.txt', 'a')
+
+    f.write(text)
+    f.close()
+
+class RunningStatistics:
+    """
+
+    Keeps running statistics of a scalar or vector quantity as it is updated, in constant memory.
+
+        Attributes:
+            count (int): The number of values seen.
+
+            initial (float/list-like): The first value.
+
+            last (float/list-like): The most recent value.
+
+            mean (float/list-like): The mean of all values.
+
+            maxDrift (float): The largest distance of any value from the initial value.
+
+        Methods:
+            update(value): Adds a new value to the statistics.
+
+            mean_step_change(): Returns the average change between consecutive values.
+
+            variance(): Returns the variance of all values.
+
+            state(): Returns every attribute, so the statistics can be checkpointed.
+
+            restore(state): Sets every attribute from a checkpointed state.
+
+    """
+
+    def __init__(self):
+        """
+
+        Initialises a new RunningStatistics instance with no values.
+
+        """
+        self.count = 0
+        self.initial = None
+        self.last = None
+        self.mean = 0
+        self.maxDrift = 0
+
+        #The sum of squared differences from the mean, for Welford's algorithm.
+        self._M2 = 0
+
+    def update(self, value):
+        """
+
+        Adds a new value to the statistics.
+
+            Parameters:
+                value (float/list-like): The new value of the quantity.
+
+        """
+        value = np.array(value, dtype = float)
+
+        if self.count == 0:
+            self.initial = value
+
+        self.count += 1
+        self.last = value
+
+        #Updates the mean and variance with Welford's algorithm.
+        delta = value - self.mean
+        self.mean = self.mean + delta / self.count
+        self._M2 = self._M2 + delta * (value - self.mean)
+
+        self.maxDrift = max(self.maxDrift, float(np.linalg.norm(value - self.initial)))
+
+    def mean_step_change(self):
+        """
+
+        Returns the average change between consecutive values, which only depends on the first and last values.
+
+            Returns:
+                meanStepChange (float/list-like): The average change per update.
+
+        """
+        return((self.last - self.initial) / max(self.count - 1, 1))
+
+    def variance(self):
+        """
+
+        Returns the variance of all values so far.
+
+            Returns:
+                variance (float/list-like): The variance of each component.
+
+        """
+        return(self._M2 / max(self.count, 1))
+
+    def state(self):
+        """
+
+        Returns every attribute, so the statistics can be saved in a checkpoint and carried on after a restart.
+
+            Returns:
+                state (dict): The count, initial, last, mean, maxDrift and _M2 attributes.
+
+        """
+        return({'count': self.count, 'initial': self.initial, 'last': self.last, 'mean': self.mean,
+            'maxDrift': self.maxDrift, '_M2': self._M2})
+
+    def restore(self, state):
+        """
+
+        Sets every attribute from a state returned by state().
+
+            Parameters:
+                state (dict): The count, initial, last, mean, maxDrift and _M2 attributes.
+
+        """
+        self.count = int(state['count'])
+        self.initial = np.array(state['initial'], dtype = float)
+        self.last = np.array(state['last'], dtype = float)
+        self.mean = np.array(state['mean'], dtype = float)
+        self.maxDrift = float(state['maxDrift'])
+        self._M2 = np.array(state['_M2'], dtype = float)
+
+
+class ConservationAccumulator:
+    """
+
+    Tracks the total energy, angular momentum and linear momentum of the system while it runs, so the conservation
+    tests don't need to re-read the files afterwards. Main only updates it on output steps, so the average changes are
+    per output rather than per step when the output stride is above one.
+
+        Attributes:
+            energy (RunningStatistics): The statistics of the total energy.
+
+            angularMomentum (RunningStatistics): The statistics of the total angular momentum.
+
+            linearMomentum (RunningStatistics): The statistics of the total linear momentum.
+
+        Methods:
+            update(system): Adds the current state of the system to the statistics.
+
+            summary(): Returns the average changes and initial values in the same form as the cons_of_ functions.
+
+            state(): Returns the state of every statistic, so they can be checkpointed.
+
+            restore(state): Sets every statistic from a checkpointed state.
+
+    """
+
+    def __init__(self, system):
+        """
+
+        Initialises a new ConservationAccumulator instance from the initial state of the system.
+
+            Parameters:
+                system (System): Contains all Particle instances defined for the system.
+
+        """
+        self.energy = RunningStatistics()
+        self.angularMomentum = RunningStatistics()
+        self.linearMomentum = RunningStatistics()
+
+        self.update(system)
+
+    def update(self, system):
+        """
+
+        Adds the current energy, angular momentum and linear momentum of the system to the statistics.
+
+            Parameters:
+                system (System): Contains all Particle instances defined for the system.
+
+            Returns:
+                diagnostics (tuple): The total energy, linear momentum and angular momentum, for reuse by the writer.
+
+        """
+        kineticEnergy, potentialEnergy, linearMomentum, angularMomentum = diagnostics(system)
+        energy = kineticEnergy + potentialEnergy
+
+        self.energy.update(energy)
+        self.angularMomentum.update(angularMomentum)
+        self.linearMomentum.update(linearMomentum)
+
+        return(energy, linearMomentum, angularMomentum)
+
+    def summary(self):
+        """
+
+        Returns the average change between updates and the initial value of each conserved quantity.
+
+            Returns:
+                dE (float), E (float), dL (list-like), L (list-like), dp (list-like), p (list-like)
+
+        """
+        return(self.energy.mean_step_change(), float(self.energy.initial),
+            self.angularMomentum.mean_step_change(), self.angularMomentum.initial,
+            self.linearMomentum.mean_step_change(), self.linearMomentum.initial)
+
+    def state(self):
+        """
+
+        Returns the state of every statistic as one flat dictionary, i.e. 'energy_count', for saving in a checkpoint.
+
+            Returns:
+                state (dict): The attributes of each statistic, prefixed by its name.
+
+        """
+        state = {}
+        for name in ['energy', 'angularMomentum', 'linearMomentum']:
+            for key, value in getattr(self, name).state().items():
+                state[name + '_' + key] = value
+
+        return(state)
+
+    def restore(self, state):
+        """
+
+        Sets every statistic from a state returned by state().
+
+            Parameters:
+                state (dict): The attributes of each statistic, prefixed by its name.
+
+        """
+        for name in ['energy', 'angularMomentum', 'linearMomentum']:
+            getattr(self, name).restore({key[len(name) + 1:]: value for key, value in state.items()
+                if key.startswith(name + '_')})
+
+
+def cons_of_energy(directory = 'ephemeride_data'):
     """
 
     Returns the average change in energy and the intial energy as a test for energy conservation.
 
+    This re-reads energy.txt, so it is only needed when the run's ConservationAccumulator is not available.
+
+        Parameters:
+            directory (str): The folder the files are read from.
+
         Returns:
             dE_ave(float): The average change in total energy across the simulation.
 
             E(float): The initial total energy.
 
     """
-    f = open('ephemeride_data/energy.txt', 'r')
+    f = open(directory + '/energy.txt', 'r')
 
     #Contains all the energies
     dataList = f.read().rstrip('\n').split('\n')
@@ -166,11 +561,16 @@ def cons_of_energy():
     #Calculates the average of the list
     return(np.mean(np.array(dE)), float(dataList[0]))
 
-def cons_of_LM():
+def cons_of_LM(directory = 'ephemeride_data'):
     """
 
     Returns the average change in linear momentum and the intial linear momentum as a test for conservation.
 
+    This re-reads total_LM.txt, so it is only needed when the run's ConservationAccumulator is not available.
+
+        Parameters:
+            directory (str): The folder the files are read from.
+
         Returns:
             dp_ave(float): The average change in total linear momentum across the simulation.
 
@@ -178,7 +578,7 @@ def cons_of_LM():
 
     """
 
-    f = open('ephemeride_data/total_LM.txt', 'r')
+    f = open(directory + '/total_LM.txt', 'r')
 
     #Contains all the angular momenta
     dataList = f.read().rstrip('\n').split('\n')
@@ -205,15 +605,20 @@ def cons_of_LM():
     f.close()
 
     #Calculates the average of the list
-    dp_ave = np.array([np.mean(np.array(dp)[0]), np.mean(np.array(dp)[1]), np.mean(np.array(dp)[2])])
+    dp_ave = np.mean(np.array(dp), axis = 0)
 
     return(dp_ave, dataList[0])
 
-def cons_of_AM():
+def cons_of_AM(directory = 'ephemeride_data'):
     """
 
     Returns the average change in angular momentum and the intial angular momentum as a test for conservation.
 
+    This re-reads total_AM.txt, so it is only needed when the run's ConservationAccumulator is not available.
+
+        Parameters:
+            directory (str): The folder the files are read from.
+
         Returns:
             dL_ave(float): The average change in total angular momentum across the simulation.
 
@@ -221,7 +626,7 @@ def cons_of_AM():
 
     """
 
-    f = open('ephemeride_data/total_AM.txt', 'r')
+    f = open(directory + '/total_AM.txt', 'r')
 
     #Contains all the angular momenta
     dataList = f.read().rstrip('\n').split('\n')
@@ -248,7 +653,7 @@ def cons_of_AM():
     f.close()
 
     #Calculates the average of the list
-    dL_ave = np.array([np.mean(np.array(dL)[0]), np.mean(np.array(dL)[1]), np.mean(np.array(dL)[2])])
+    dL_ave = np.mean(np.array(dL), axis = 0)
 
     return(dL_ave, dataList[0])
 
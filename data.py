@@ -4,14 +4,37 @@ Scrapes the data from which to build the simulation.
 Data is from JPL Horizons.
 Solar System Barycentre.
 
+astropy, poliastro and spiceypy take seconds to import, so they are only imported inside the functions that use them,
+and runs that only hit the cache never load them. For the same reason time_difference counts the leap seconds itself
+rather than asking astropy, for any date since 1972.
+
 """
 
-from astropy.time import Time
-from astropy.coordinates import get_body_barycentric_posvel
-from poliastro import constants
-from astropy.constants import G
-from spiceypy import sxform, mxvg
 import numpy as np
+import hashlib
+import json
+import os
+from datetime import datetime
+
+#Where fetched states are kept between runs, and the most files kept there, enough for several runs' trajectory checks.
+cacheDirectory = 'jpl_cache'
+cacheLimit = 1024
+
+#The states already fetched by this process, by cache key.
+_memo = {}
+
+#The date format made by date_convert.
+dateFormat = '%Y-%m-%d %H:%M:%S.%f'
+
+#The number of seconds UTC is behind TAI from each date on, since UTC took whole leap seconds at the start of 1972.
+leapSeconds = [
+    ((1972, 1, 1), 10), ((1972, 7, 1), 11), ((1973, 1, 1), 12), ((1974, 1, 1), 13), ((1975, 1, 1), 14),
+    ((1976, 1, 1), 15), ((1977, 1, 1), 16), ((1978, 1, 1), 17), ((1979, 1, 1), 18), ((1980, 1, 1), 19),
+    ((1981, 7, 1), 20), ((1982, 7, 1), 21), ((1983, 7, 1), 22), ((1985, 7, 1), 23), ((1988, 1, 1), 24),
+    ((1990, 1, 1), 25), ((1991, 1, 1), 26), ((1992, 7, 1), 27), ((1993, 7, 1), 28), ((1994, 7, 1), 29),
+    ((1996, 1, 1), 30), ((1997, 7, 1), 31), ((1999, 1, 1), 32), ((2006, 1, 1), 33), ((2009, 1, 1), 34),
+    ((2012, 7, 1), 35), ((2015, 7, 1), 36), ((2017, 1, 1), 37),
+]
 
 def date_convert(day, month, year):
     """
@@ -63,6 +86,9 @@ def time_difference(dateString1, dateString2):
 
     Takes two datetimes and returns the difference between them in seconds.
 
+    The datetimes are UTC, so any leap seconds between them are added to the calendar difference, as astropy does.
+    astropy is only imported for dates before 1972, when UTC did not yet step by whole seconds.
+
         Parameters:
             dateString1 (str): The start datetime, yyyy-mm-dd hh:mm:ss:ms
 
@@ -72,6 +98,17 @@ def time_difference(dateString1, dateString2):
             dt (float): The difference between the two datetimes in seconds.
 
     """
+    try:
+        t1 = datetime.strptime(dateString1, dateFormat)
+        t2 = datetime.strptime(dateString2, dateFormat)
+    except ValueError:
+        t1 = t2 = None
+
+    if t1 is not None and min(t1, t2) >= datetime(*leapSeconds[0][0]):
+        return((t2 - t1).total_seconds() + leap_seconds(t2) - leap_seconds(t1))
+
+    from astropy.time import Time
+
     #Converts datestrings into Time objects.
     t1 = Time(dateString1)
     t2 = Time(dateString2)
@@ -81,32 +118,106 @@ def time_difference(dateString1, dateString2):
 
     #Conversion from numpy float to python float
     return(dt.item())
+
+def leap_seconds(moment):
+    """
+
+    Returns how many seconds UTC is behind TAI at a moment since 1972.
+
+        Parameters:
+            moment (datetime): The UTC datetime.
+
+        Returns:
+            offset (int): TAI - UTC in seconds.
+
+    """
+    offset = leapSeconds[0][1]
+    for date, seconds in leapSeconds:
+        if moment >= datetime(*date):
+            offset = seconds
+
+    return(offset)
+
+def date_offset(dateString, seconds):
+    """
+
+    Returns the datetime a number of seconds after another, in the same format, so the states at times through a run
+    can be cached under their own dates. The dates are TDB, as the states are, so there are no leap seconds to count.
+
+        Parameters:
+            dateString (str): The datetime, yyyy-mm-dd hh:mm:ss:ms
+
+            seconds (float): The time after it, in seconds.
+
+        Returns:
+            dateString (str): The later datetime, yyyy-mm-dd hh:mm:ss:ms
+
+    """
+    from datetime import timedelta
+
+    moment = datetime.strptime(dateString, dateFormat) + timedelta(seconds = float(seconds))
+
+    #Writes whole seconds as date_convert does, so the start date gets the same cache key as in jpl_scrape.
+    fraction = str(moment.microsecond).rjust(6, '0').rstrip('0') or '0'
+
+    return(moment.isoformat(' ', 'seconds') + '.' + fraction)
     
 
-def jpl_scrape(dateString):
+def cache_key(dateString, bodies, ephemeris, frame):
     """
 
-    Scrapes the JPL data from astropy and poliastro, and returns it in list of dictionaries.
+    Builds the key that a set of JPL states is cached under.
 
         Parameters:
-            dateString (str): The start datetime, yyyy-mm-dd hh:mm:ss:ms
+            dateString (str): The datetime, yyyy-mm-dd hh:mm:ss:ms
+
+            bodies (list-like): The names of the bodies.
+
+            ephemeris (str): The astropy ephemeris the states come from.
+
+            frame (str): The SPICE frame the states are transformed into.
 
         Returns:
-            jplData (list-like): A list of data organised into separate dictionaries for each ephemeride.
+            key (str): A hex digest unique to the arguments.
 
     """
+    return(hashlib.sha1(json.dumps([dateString, list(bodies), ephemeris, frame]).encode()).hexdigest())
 
-    #Creates a list in which to store the JPL data
-    jplData = []
+def fetch_states(dateString, bodies, ephemeris = 'jpl', frame = 'ECLIPJ2000'):
+    """
+
+    Fetches the state vectors and masses of the bodies from astropy and poliastro, without using the cache.
+
+        Parameters:
+            dateString (str): The datetime, yyyy-mm-dd hh:mm:ss:ms
+
+            bodies (list-like): The names of the bodies, i.e. those in ephemerides.
+
+            ephemeris (str): The astropy ephemeris to use.
+
+            frame (str): The SPICE frame to transform the states into.
+
+        Returns:
+            states (array-like): The (B, 6) array of positions and velocities, in metres and metres/second.
+
+            masses (array-like): The (B,) array of masses, in kilograms.
+
+    """
+    from astropy.time import Time
+    from astropy.coordinates import get_body_barycentric_posvel
+    from spiceypy import sxform, mxvg
+
+    states = np.empty((len(bodies), 6))
 
-    #Get the time at 0:00:00.0 on the 4th December 2023
     t = Time(dateString, scale="tdb")
 
-    #Loops across the bodies in the list, and enumerates to index the colour list later.
-    for count, body in enumerate(ephemerides):
+    #Get transformation matrix to the chosen frame (use time in Julian Days)
+    trans = sxform("J2000", frame, t.jd)
+
+    for count, body in enumerate(bodies):
 
         #Get positions of velocities for the current body
-        pos, vel = get_body_barycentric_posvel(body, t, ephemeris="jpl")
+        pos, vel = get_body_barycentric_posvel(body, t, ephemeris=ephemeris)
 
         #Make a "state vector" of positions and velocities (in metres and metres/second, respectively)
         statevec = [
@@ -118,28 +229,272 @@ def jpl_scrape(dateString):
             vel.xyz[2].to("m/s").value,
         ]
 
-        #Get transformation matrix to the ecliptic (use time in Julian Days)
-        trans = sxform("J2000", "ECLIPJ2000", t.jd)
+        #Transform state vector to the chosen frame
+        states[count] = mxvg(trans, statevec)
 
-        #Transform state vector to ecliptic
-        statevececl = mxvg(trans, statevec)
+    return(states, fetch_masses(bodies))
+
+def fetch_masses(bodies):
+    """
+
+    Fetches the masses of the bodies from poliastro's GM constants.
+
+        Parameters:
+            bodies (list-like): The names of the bodies, i.e. those in ephemerides.
+
+        Returns:
+            masses (array-like): The (B,) array of masses, in kilograms.
+
+    """
+    from astropy.constants import G
+    from poliastro import constants
+
+    #Gets the GM constant using the body string
+    return(np.array([(getattr(constants, ('GM_'+body))/G).value for body in bodies]))
+
+def cached_states(dateString, bodies, ephemeris = 'jpl', frame = 'ECLIPJ2000'):
+    """
 
-        #Get mass - gets the GM constant using the body string
-        mass = (getattr(constants, ('GM_'+body))/G).value
+    Returns the state vectors and masses of the bodies, fetching them only if they aren't already in this process's
+    memo or in the cache directory.
+
+    Cache files are touched whenever they are used, and the least recently used are deleted once there are more than
+    cacheLimit of them. A file that can't be read is fetched again.
+
+        Parameters:
+            see fetch_states.
+
+        Returns:
+            states (array-like), masses (array-like): see fetch_states.
+
+    """
+    key = cache_key(dateString, bodies, ephemeris, frame)
+
+    if key in _memo:
+        return(_memo[key])
+
+    fileName = os.path.join(cacheDirectory, key + '.npz')
+
+    try:
+        with np.load(fileName) as cached:
+            states, masses = cached['states'], cached['masses']
+        os.utime(fileName)
+
+    except (OSError, KeyError, ValueError):
+        states, masses = fetch_states(dateString, bodies, ephemeris, frame)
+        save_states(fileName, states, masses)
+        limit_cache()
+
+    _memo[key] = (states, masses)
+
+    return(states, masses)
+
+def cached_epochs(dateString, times, bodies = None, ephemeris = 'jpl', frame = 'ECLIPJ2000'):
+    """
+
+    Returns the state vectors of the bodies at many times, as jpl_states does, but through the same memo and cache
+    directory as cached_states, with each time cached under its own date. Any times not yet cached are fetched together
+    with one call to jpl_states.
+
+        Parameters:
+            see jpl_states.
+
+        Returns:
+            states (array-like): The (T, B, 6) array of positions and velocities, in metres and metres/second.
+
+    """
+    if bodies is None:
+        bodies = ephemerides
+
+    times = np.atleast_1d(np.asarray(times, dtype = float))
+    keys = [cache_key(date_offset(dateString, time), bodies, ephemeris, frame) for time in times]
+    states = np.empty((len(times), len(bodies), 6))
+    missing = []
+
+    for count, key in enumerate(keys):
+        if key in _memo:
+            states[count] = _memo[key][0]
+            continue
+
+        fileName = os.path.join(cacheDirectory, key + '.npz')
+
+        try:
+            with np.load(fileName) as cached:
+                _memo[key] = (cached['states'], cached['masses'])
+            os.utime(fileName)
+            states[count] = _memo[key][0]
+
+        except (OSError, KeyError, ValueError):
+            missing.append(count)
+
+    if missing:
+        states[missing] = jpl_states(dateString, times[missing], bodies, ephemeris, frame)
+        masses = fetch_masses(bodies)
+
+        for count in missing:
+            save_states(os.path.join(cacheDirectory, keys[count] + '.npz'), states[count], masses)
+            _memo[keys[count]] = (states[count].copy(), masses)
+
+        limit_cache()
+
+    return(states)
+
+def save_states(fileName, states, masses):
+    """
+
+    Writes one set of states and masses to the cache directory.
+
+    Writes to a temporary file first, so an interrupted run never leaves half a file behind, named by process so
+    parallel runs fetching the same states don't write over each other's.
+
+        Parameters:
+            fileName (str): The path of the cache file.
+
+            states (array-like), masses (array-like): see fetch_states.
+
+    """
+    temporaryName = fileName + '.' + str(os.getpid()) + '.tmp'
+    os.makedirs(cacheDirectory, exist_ok = True)
+    np.savez(temporaryName, states = states, masses = masses)
+    os.replace(temporaryName + '.npz', fileName)
+
+def limit_cache(limit = None):
+    """
+
+    Deletes the least recently used files in the cache directory until there are no more than limit of them.
+
+        Parameters:
+            limit (int): The most files to keep, cacheLimit by default.
+
+    """
+    if limit is None:
+        limit = cacheLimit
+
+    #Files still being written by other processes are left alone.
+    fileNames = [os.path.join(cacheDirectory, name) for name in os.listdir(cacheDirectory)
+        if name.endswith('.npz') and not name.endswith('.tmp.npz')]
+    fileNames.sort(key = os.path.getmtime)
+
+    for fileName in fileNames[:max(len(fileNames) - limit, 0)]:
+        os.remove(fileName)
+
+def clear_cache(memory = True, disk = True):
+    """
+
+    Empties the cache, so that the next states are fetched again, i.e. after the ephemeris has been updated.
+
+        Parameters:
+            memory (bool): Whether to empty this process's memo.
+
+            disk (bool): Whether to delete the files in the cache directory.
+
+    """
+    if memory:
+        _memo.clear()
+
+    if disk and os.path.isdir(cacheDirectory):
+        limit_cache(0)
+
+def jpl_states(dateString, times, bodies = None, ephemeris = 'jpl', frame = 'ECLIPJ2000'):
+    """
+
+    Finds the state vectors of the bodies at many times at once, with one astropy call per body covering every time.
+
+    The frame rotation is looked up once if it is the same at the first and last times, as it is for inertial frames
+    such as the ecliptic, and once per time otherwise, then applied to every state together.
+
+        Parameters:
+            dateString (str): The start datetime, yyyy-mm-dd hh:mm:ss:ms
+
+            times (array-like): The (T,) array of times after the start, in seconds.
+
+            bodies (list-like): The names of the bodies, all of ephemerides by default.
+
+            ephemeris (str): The astropy ephemeris to use.
+
+            frame (str): The SPICE frame to transform the states into, the ecliptic by default.
+
+        Returns:
+            states (array-like): The (T, B, 6) array of positions and velocities, in metres and metres/second.
+
+    """
+    from astropy.time import Time, TimeDelta
+    from astropy.coordinates import get_body_barycentric_posvel
+    from spiceypy import sxform
+
+    if bodies is None:
+        bodies = ephemerides
+
+    t = Time(dateString, scale="tdb") + TimeDelta(np.atleast_1d(np.asarray(times, dtype = float)), format = "sec")
+    julianDays = np.atleast_1d(t.jd)
+
+    #Get the transformation matrices to the chosen frame, shaped (1, 6, 6) or (T, 6, 6)
+    first = np.array(sxform("J2000", frame, julianDays[0]))
+    if np.array_equal(first, np.array(sxform("J2000", frame, julianDays[-1]))):
+        rotations = first[np.newaxis]
+    else:
+        rotations = np.array([sxform("J2000", frame, julianDay) for julianDay in julianDays])
+
+    states = np.empty((len(julianDays), len(bodies), 6))
+
+    for count, body in enumerate(bodies):
+        pos, vel = get_body_barycentric_posvel(body, t, ephemeris=ephemeris)
+
+        #The (T, 6) state vectors of this body, in metres and metres/second
+        statevec = np.concatenate([
+            np.asarray(pos.xyz.to("m").value).reshape(3, -1),
+            np.asarray(vel.xyz.to("m/s").value).reshape(3, -1),
+        ]).T
+
+        states[:, count] = (rotations @ statevec[:, :, np.newaxis])[:, :, 0]
+
+    return(states)
+
+def jpl_scrape(dateString, bodies = None, ephemeris = 'jpl', frame = 'ECLIPJ2000', cache = True):
+    """
+
+    Scrapes the JPL data from astropy and poliastro, and returns it in list of dictionaries.
+
+    The states are cached on disk, so repeated runs from the same dates start straight away and work offline.
+
+        Parameters:
+            dateString (str): The start datetime, yyyy-mm-dd hh:mm:ss:ms
+
+            bodies (list-like): The names of the bodies to scrape, all of ephemerides by default.
+
+            ephemeris (str): The astropy ephemeris to use.
+
+            frame (str): The SPICE frame to transform the states into, the ecliptic by default.
+
+            cache (bool): Whether to use the cache; False always fetches the data again.
+
+        Returns:
+            jplData (list-like): A list of data organised into separate dictionaries for each ephemeride.
+
+    """
+    if bodies is None:
+        bodies = ephemerides
+
+    if cache:
+        states, masses = cached_states(dateString, bodies, ephemeris, frame)
+    else:
+        states, masses = fetch_states(dateString, bodies, ephemeris, frame)
+
+    #Creates a list in which to store the JPL data
+    jplData = []
 
-        #Get positions and velocities
-        position = [statevececl[0], statevececl[1], statevececl[2]]
-        velocity = [statevececl[3], statevececl[4], statevececl[5]]
+    for count, body in enumerate(bodies):
+        index = ephemerides.index(body)
 
         jplData.append(
             #Dictionary storing each required data point that I need
             {
                 'Name': body,
-                'Mass': mass,
-                'Radius': radii[count],
-                'Position': position,
-                'Velocity': velocity,
-                'Colour': colours[count]
+                'Mass': float(masses[count]),
+                'Radius': radii[index],
+                'Position': states[count, :3].tolist(),
+                'Velocity': states[count, 3:].tolist(),
+                'Colour': colours[index]
             },
         )
 
@@ -0,0 +1,101 @@
+"""
+
+Quick independent script to time how long the simulation's modules take to import, and to check that none of them
+loads astropy, poliastro, spiceypy or matplotlib at import time.
+
+It then times a whole one-day run through Main.main with the JPL states already in jpl_cache, and checks that it
+doesn't load them either. The run is made once beforehand to fill the cache; if that fails, i.e. without astropy or a
+connection, the cached run is skipped.
+
+Each import and run is timed in a fresh interpreter, as it would be at the start of a run. Run it from the repository
+root, or from this folder.
+
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+#The folder containing Main.py, two levels up from this script.
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+#The modules imported before the menu appears or a batch run starts.
+modules = ['data', 'Graphics', 'Particle', 'System', 'Integrators', 'Octree', 'Files', 'Tests', 'Profiler']
+
+#The packages that should only be imported once they are actually used.
+heavyPackages = ['astropy', 'poliastro', 'spiceypy', 'matplotlib']
+
+repeats = 10
+runRepeats = 3
+
+#Prints any heavy packages loaded so far, as the last line of the output.
+report = 'print(",".join(name for name in ' + repr(heavyPackages) + ' if name in sys.modules))'
+
+#Imports the modules, then prints any heavy packages that came with them.
+code = ('import sys\n'
+    'import ' + ', '.join(modules) + '\n' + report)
+
+#Runs one simulated day without plotting, then prints any heavy packages it loaded.
+runDirectory = tempfile.mkdtemp(prefix = 'startup_time_')
+runArguments = ['--set', 'startDate=04/12/2023', '--set', 'endDate=05/12/2023', '--set', 'deltaT=3600', '--set',
+    'plot=false', '--set', 'directory=' + runDirectory]
+runCode = ('import sys\n'
+    'import Main\n'
+    'Main.main(' + repr(runArguments) + ')\n' + report)
+
+#Times an empty interpreter too, so the cost of the imports alone can be shown.
+times = []
+emptyTimes = []
+
+for i in range(repeats):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd = root, capture_output = True, text = True, check = True)
+    times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check = True)
+    emptyTimes.append(time.perf_counter() - start)
+
+loaded = result.stdout.strip()
+
+print('Interpreter start: ' + str(round(np.median(emptyTimes) * 1000, 1)) + ' ms')
+print('Start with imports: ' + str(round(np.median(times) * 1000, 1)) + ' ms')
+print('Imports alone: ' + str(round((np.median(times) - np.median(emptyTimes)) * 1000, 1)) + ' ms')
+
+#Fills the cache, then times the run with every state read from it.
+runTimes = []
+runLoaded = ''
+
+try:
+    warm = subprocess.run([sys.executable, '-c', runCode], cwd = root, capture_output = True, text = True)
+
+    if warm.returncode != 0:
+        print('Cached run skipped, the states could not be fetched: ' + (warm.stderr.strip().split('\n') or [''])[-1])
+
+    else:
+        for i in range(runRepeats):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', runCode], cwd = root, capture_output = True, text = True,
+                check = True)
+            runTimes.append(time.perf_counter() - start)
+
+        runLoaded = result.stdout.split('\n')[-2]
+        print('Cached one-day run: ' + str(round(np.median(runTimes) * 1000, 1)) + ' ms')
+
+finally:
+    shutil.rmtree(runDirectory, ignore_errors = True)
+
+if loaded:
+    print('Loaded at import time: ' + loaded)
+
+if runLoaded:
+    print('Loaded by the cached run: ' + runLoaded)
+
+if loaded or runLoaded:
+    sys.exit(1)
+
+print('No heavy packages loaded at import time' + (' or by the cached run.' if runTimes else '.'))
@@ -0,0 +1,300 @@
+"""
+
+Quick independent script to measure how many steps per second the simulation takes, for synthetic systems of several
+sizes, with every integrator in Integrators.registry and with the output files written or not.
+
+The systems are a Sun-like star with N - 1 bodies on randomly placed near-circular orbits, made from a fixed seed, so
+the benchmark runs offline and every run times the same thing. Their masses are close enough that no close encounters
+are subcycled. Each case takes one step to fill the caches, then steps until --min-time seconds have passed or
+--max-steps steps are taken, keeping the best of --repeats.
+
+The results are written as JSON, along with the versions and machine they came from, i.e.
+
+    python testing/benchmarks/step_throughput.py --output before.json
+    python testing/benchmarks/step_throughput.py --output after.json --compare before.json
+
+prints the speed of each case relative to before.json. Run it from the repository root, or from this folder.
+
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+
+#The folder containing Main.py, two levels up from this script.
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, root)
+
+import Tests
+from Main import update
+from Particle import Particle
+from System import System
+from Files import TrajectoryWriter
+from Integrators import registry, get_integrator
+
+AU = 1.495978707e11
+
+#The direct solver and the block integrator's timescales build (N, N, 3) arrays, which stop fitting in memory above
+#a few thousand bodies.
+pairLimit = 2000
+
+def synthetic_system(bodyNumber, solver = 'direct', seed = 0):
+    """
+
+    Creates a star with bodyNumber - 1 bodies on near-circular orbits between 0.4 and 30 AU.
+
+        Parameters:
+            bodyNumber (int): The number of bodies, including the star.
+
+            solver (str): The force solver, see System.
+
+            seed (int): The seed of the random orbits.
+
+        Returns:
+            system (System): The synthetic system, with zero total momentum.
+
+    """
+    generator = np.random.default_rng(seed)
+    starMass = 1.989e30
+    orbitNumber = bodyNumber - 1
+
+    radii = AU * np.exp(generator.uniform(np.log(0.4), np.log(30), orbitNumber))
+    angles = generator.uniform(0, 2 * np.pi, orbitNumber)
+    inclinations = np.radians(generator.uniform(-5, 5, orbitNumber))
+    masses = 10**generator.uniform(21, 25, orbitNumber)
+
+    speeds = np.sqrt(6.67408E-11 * starMass / radii)
+    positions = radii[:, np.newaxis] * np.stack([np.cos(angles), np.sin(angles) * np.cos(inclinations),
+        np.sin(angles) * np.sin(inclinations)], axis = 1)
+    velocities = speeds[:, np.newaxis] * np.stack([-np.sin(angles), np.cos(angles) * np.cos(inclinations),
+        np.cos(angles) * np.sin(inclinations)], axis = 1)
+
+    #The star moves against the other bodies so the barycentre stays still.
+    particles = [Particle(name = 'Star', mass = starMass, radius = 7e8, position = np.zeros(3),
+        velocity = -(masses @ velocities) / starMass, colour = '#ffff00')]
+
+    for i in range(orbitNumber):
+        particles.append(Particle(name = 'Body_' + str(i), mass = masses[i], radius = 1e6, position = positions[i],
+            velocity = velocities[i], colour = '#ffffff'))
+
+    return(System(particles, solver = solver))
+
+def time_steps(system, deltaT, algorithm, output, minTime, maxSteps):
+    """
+
+    Times the steps of one system, as Main.update takes them.
+
+        Parameters:
+            system (System): The system to step.
+
+            deltaT (float): The time step.
+
+            algorithm (int): The number of the integrator, see Integrators.registry.
+
+            output (bool): Whether the text and binary output files and conservation statistics are kept, as in a run.
+
+            minTime (float): The least time spent stepping, in seconds.
+
+            maxSteps (int): The most steps taken.
+
+        Returns:
+            steps (int): The number of steps timed.
+
+            seconds (float): The time they took.
+
+            bytesWritten (int): The size of the output files, or 0 without output.
+
+    """
+    if not output:
+        system.step(deltaT, algorithm)
+
+        steps = 0
+        start = time.perf_counter()
+        while steps < maxSteps and (steps == 0 or time.perf_counter() - start < minTime):
+            system.step(deltaT, algorithm)
+            steps += 1
+
+        return(steps, time.perf_counter() - start, 0)
+
+    directory = tempfile.mkdtemp(prefix = 'step_throughput_')
+    accumulator = Tests.ConservationAccumulator(system)
+
+    try:
+        with TrajectoryWriter(system, directory = directory, chunkSize = 1000, text = True, binary = True,
+            header = {'deltaT': deltaT, 'algorithm': algorithm}) as writer:
+            update(system, deltaT, algorithm, writer, accumulator)
+
+            steps = 0
+            start = time.perf_counter()
+            while steps < maxSteps and (steps == 0 or time.perf_counter() - start < minTime):
+                update(system, deltaT, algorithm, writer, accumulator)
+                steps += 1
+
+            #The buffered steps are written inside the timing, as the end of a run would.
+            writer.flush()
+            seconds = time.perf_counter() - start
+
+        bytesWritten = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    finally:
+        shutil.rmtree(directory, ignore_errors = True)
+
+    return(steps, seconds, bytesWritten)
+
+def run_case(bodyNumber, algorithm, output, solver, deltaT, minTime, maxSteps, repeats):
+    """
+
+    Times one case several times from the same starting state, keeping the fastest.
+
+        Returns:
+            result (dict): The case and its best steps per second, or why it was skipped.
+
+    """
+    integrator = registry[algorithm]
+
+    if solver is None:
+        solver = 'direct' if bodyNumber <= pairLimit else 'barnes-hut'
+
+    result = {
+        'bodies': bodyNumber,
+        'algorithm': integrator.name,
+        'output': output,
+        'solver': solver,
+        'deltaT': deltaT,
+    }
+
+    if bodyNumber > pairLimit and (solver == 'direct' or integrator.name == 'block'):
+        result['skipped'] = 'needs the full (N, N) pair arrays, above ' + str(pairLimit) + ' bodies'
+        return(result)
+
+    best = None
+    for repeat in range(repeats):
+        steps, seconds, bytesWritten = time_steps(synthetic_system(bodyNumber, solver), deltaT, algorithm, output,
+            minTime, maxSteps)
+
+        if best is None or steps / seconds > best[0] / best[1]:
+            best = (steps, seconds, bytesWritten)
+
+    steps, seconds, bytesWritten = best
+    result['steps'] = steps
+    result['seconds'] = seconds
+    result['stepsPerSecond'] = steps / seconds
+    result['bodyStepsPerSecond'] = bodyNumber * steps / seconds
+    result['forceEvaluationsPerSecond'] = integrator.forceEvaluations * steps / seconds
+
+    #The files also hold the warm-up step.
+    result['bytesPerStep'] = bytesWritten / (steps + 1)
+
+    return(result)
+
+def machine():
+    """
+
+    Describes the code and machine the results came from.
+
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd = root, capture_output = True, text = True,
+            check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return({
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    })
+
+def case_key(result):
+    """
+
+    Identifies a case, so the same case can be found in another set of results.
+
+    """
+    return((result['bodies'], result['algorithm'], result['output'], result['solver'], result['deltaT']))
+
+def compare(results, fileName):
+    """
+
+    Prints the speed of each case relative to the same case in an earlier results file.
+
+    """
+    f = open(fileName, 'r')
+    previous = {case_key(result): result for result in json.load(f)['results']}
+    f.close()
+
+    print('Relative to ' + fileName + ':')
+    for result in results:
+        old = previous.get(case_key(result))
+
+        if old is None or 'stepsPerSecond' not in old or 'stepsPerSecond' not in result:
+            continue
+
+        print('    ' + format_case(result) + format(result['stepsPerSecond'] / old['stepsPerSecond'], '.2f') + 'x')
+
+def format_case(result):
+    """
+
+    Names a case in one fixed-width line.
+
+    """
+    return('N = ' + str(result['bodies']).ljust(6) + result['algorithm'].ljust(18) + result['solver'].ljust(12) +
+        ('output' if result['output'] else 'no output').ljust(11))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Times the steps per second of synthetic systems.')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [11, 100, 1000, 10000],
+        help = 'the numbers of bodies')
+    parser.add_argument('--algorithms', nargs = '+', default = None,
+        help = 'the integrators, by number or name, every one in the registry by default')
+    parser.add_argument('--output-modes', choices = ['on', 'off'], nargs = '+', default = ['off', 'on'],
+        help = 'whether the output files are written')
+    parser.add_argument('--solver', default = None,
+        help = 'the force solver, direct up to ' + str(pairLimit) + ' bodies and barnes-hut above by default')
+    parser.add_argument('--deltaT', type = float, default = 3600, help = 'the time step in seconds')
+    parser.add_argument('--min-time', type = float, default = 1.0, help = 'the least time spent on each case')
+    parser.add_argument('--max-steps', type = int, default = 1000, help = 'the most steps timed in each case')
+    parser.add_argument('--repeats', type = int, default = 3, help = 'the number of times each case is timed')
+    parser.add_argument('--output', default = 'step_throughput.json', help = 'the JSON file the results are written to')
+    parser.add_argument('--compare', default = None, help = 'an earlier results file to compare against')
+    options = parser.parse_args()
+
+    if options.algorithms is None:
+        algorithms = sorted(registry)
+    else:
+        algorithms = [get_integrator(int(algorithm) if algorithm.isdigit() else algorithm).number
+            for algorithm in options.algorithms]
+
+    results = []
+    for bodyNumber in options.sizes:
+        for algorithm in algorithms:
+            for mode in options.output_modes:
+                result = run_case(bodyNumber, algorithm, mode == 'on', options.solver, options.deltaT,
+                    options.min_time, options.max_steps, options.repeats)
+                results.append(result)
+
+                if 'skipped' in result:
+                    print(format_case(result) + 'skipped, ' + result['skipped'])
+                else:
+                    print(format_case(result) + format(result['stepsPerSecond'], '.1f').rjust(10) + ' steps/s')
+
+    f = open(options.output, 'w')
+    json.dump({'machine': machine(), 'results': results}, f, indent = 4)
+    f.close()
+
+    print('Results written to ' + options.output)
+
+    if options.compare is not None:
+        compare(results, options.compare)